@@ -1,13 +1,40 @@
 import re
-import spacy
-from spacy.matcher import PhraseMatcher
+import threading
+from metrics import METRICS
 
 
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
-def extract_entities_spacy(text):
-    #Uses spaCy to extract entities from text.
-    #Returns:dict with entities: {person, date, org, location}
+# spaCy model, loaded on first use (importing spaCy and loading the model takes seconds)
+_nlp = None
+_load_lock = threading.Lock()
+
+# Pipeline components we never read from (we only use doc.ents)
+UNUSED_PIPES = []
+
+
+def get_nlp():
+    #Returns the spaCy pipeline, loading en_core_web_sm on the first call.
+    global _nlp, UNUSED_PIPES
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                import spacy
+                nlp = spacy.load("en_core_web_sm")
+                UNUSED_PIPES = [name for name in ("parser", "lemmatizer") if name in nlp.pipe_names]
+                _nlp = nlp
+    return _nlp
+
+
+def parse(text):
+    #Runs the spaCy pipeline once over text, skipping the components we don't use.
+    nlp = get_nlp()
+    METRICS.inc("f1_spacy_parses_total")
+    with METRICS.span("spacy"):
+        return nlp(text, disable=UNUSED_PIPES)
+
+
+def entities_from_doc(doc):
+    #Collects the entities of an already parsed Doc.
+    #Returns:dict with entities: {person, date, org, location, number}
     entities ={
         'person':[],
         'date' : [],
@@ -16,19 +43,39 @@ def extract_entities_spacy(text):
         'org'  : []
     }
 
-    doc = nlp(text)
     for ent in doc.ents :
-        if ent.label == "PERSON" :
+        if ent.label_ == "PERSON" :
             entities['person'].append(ent.text)
-        if ent.label =="DATE" :
-            entities['data'].append(ent.text)
-        if ent.label=="ORG" :
+        elif ent.label_ =="DATE" :
+            entities['date'].append(ent.text)
+        elif ent.label_=="ORG" :
             entities['org'].append(ent.text)
-        elif ent.label_ == "GPE":  
+        elif ent.label_ == "GPE":
             entities["location"].append(ent.text)
-        elif ent.label_ == "CARDINAL": 
+        elif ent.label_ == "CARDINAL":
             entities["number"].append(ent.text)
-    
+
+    return entities
+
+
+def extract_entities_spacy(text):
+    #Uses spaCy to extract entities from text.
+    #Returns:dict with entities: {person, date, org, location, number}
+    return entities_from_doc(parse(text))
+
+
+def extract_entities_spacy_batch(texts, batch_size=64):
+    #Same as extract_entities_spacy but streams many texts through nlp.pipe.
+    #Returns:list of entity dicts, in the same order as texts
+    docs = get_nlp().pipe(texts, batch_size=batch_size, disable=UNUSED_PIPES)
+    with METRICS.span("spacy_batch"):
+        entities = [entities_from_doc(doc) for doc in docs]
+    METRICS.inc("f1_spacy_parses_total", len(entities))
     return entities
 
 
+def first_entity(entities, label):
+    #First entity of a given label, or None
+    if entities[label]:
+        return entities[label][0]
+    return None
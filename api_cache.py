@@ -0,0 +1,220 @@
+"""
+Response cache for the Ergast API.
+An in-memory LRU sits in front of a persistent SQLite store, and each URL
+gets a time-to-live that follows what the endpoint returns: past seasons
+and completed races never change, current/next and current/last change
+within minutes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from urllib.parse import urlparse
+
+# Time-to-live in seconds (None = never expires)
+LIVE_TTL = 5 * 60                # current/next, current/last
+CURRENT_SEASON_TTL = 30 * 60     # anything about the running season
+DRIVER_TTL = 7 * 24 * 60 * 60    # driver profiles (numbers/codes rarely change)
+IMMUTABLE = None                 # past seasons, completed race results
+
+# Seconds a read or write waits for another process (server workers share the file) to release the database
+BUSY_TIMEOUT = 5.0
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "F1_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ergast_cache.sqlite")
+)
+
+
+def ttl_for(url, data):
+    """
+    Picks the TTL of an Ergast response from its URL, e.g.
+    /api/f1/current/next.json, /api/f1/2021/5/results.json, /api/f1/drivers/hamilton.json
+    """
+    path = urlparse(url).path
+    if path.endswith(".json"):
+        path = path[:-len(".json")]
+    parts = path.strip("/").split("/")[2:]  # drop "api/f1"
+
+    if "next" in parts or "last" in parts:
+        return LIVE_TTL
+    if parts and parts[0] == "drivers":
+        return DRIVER_TTL
+
+    season = parts[0] if parts else ""
+    if season.isdigit() and int(season) < date.today().year:
+        return IMMUTABLE
+
+    # A result of the running season is final once the race has been run
+    if len(parts) >= 3 and parts[1].isdigit() and parts[2] == "results":
+        try:
+            if data["MRData"]["RaceTable"]["Races"]:
+                return IMMUTABLE
+        except (KeyError, TypeError):
+            pass
+
+    return CURRENT_SEASON_TTL
+
+
+class CacheEntry:
+    """One cached response with the validators needed to revalidate it."""
+
+    def __init__(self, data, etag=None, last_modified=None, fetched_at=None, expires_at=None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.expires_at = expires_at
+
+    def is_fresh(self, now=None):
+        if self.expires_at is None:
+            return True
+        return (now if now is not None else time.time()) < self.expires_at
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Two-level cache keyed by request URL.
+
+    Expired entries are kept (on disk and in memory) so their validators can
+    be sent upstream; lookup() returns them and callers check is_fresh().
+    If the SQLite store can't be read or written (e.g. still locked by
+    another process after BUSY_TIMEOUT), the memory level alone is used.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=512):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0,
+                      "revalidated": 0, "stores": 0, "disk_errors": 0}
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT,"
+                " fetched_at REAL NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    def _remember(self, url, entry):
+        self._memory[url] = entry
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, url):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at, expires_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            self._disk_error("read", url, e)
+            return None
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at, expires_at = row
+        return CacheEntry(json.loads(body), etag, last_modified, fetched_at, expires_at)
+
+    def _save(self, url, entry):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, fetched_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, json.dumps(entry.data), entry.etag, entry.last_modified,
+                 entry.fetched_at, entry.expires_at),
+            )
+            self._db.commit()
+        except sqlite3.OperationalError as e:
+            self._db.rollback()
+            self._disk_error("write", url, e)
+
+    def _disk_error(self, action, url, error):
+        # The entry is still served from (or missing in) memory; the response itself isn't lost
+        self.stats["disk_errors"] += 1
+        print(f"Response cache {action} failed for {url}: {error}")
+
+    def lookup(self, url):
+        """Returns the cached entry for url (fresh or not), or None, and counts the outcome."""
+        with self._lock:
+            entry = self._memory.get(url)
+            source = "memory_hits"
+            if entry is None:
+                entry = self._load(url)
+                source = "disk_hits"
+                if entry is not None:
+                    self._remember(url, entry)
+            else:
+                self._memory.move_to_end(url)
+
+            if entry is None:
+                self.stats["misses"] += 1
+            elif entry.is_fresh():
+                self.stats[source] += 1
+            else:
+                self.stats["stale"] += 1
+            return entry
+
+    def peek(self, url):
+        """Like lookup() but without counting it (used to serve a stale entry after a failed fetch)."""
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is None:
+                entry = self._load(url)
+            return entry
+
+    def store(self, url, data, headers=None):
+        """Caches a fresh response; headers supply the ETag / Last-Modified validators."""
+        headers = headers or {}
+        ttl = ttl_for(url, data)
+        now = time.time()
+        entry = CacheEntry(
+            data,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            fetched_at=now,
+            expires_at=None if ttl is IMMUTABLE else now + ttl,
+        )
+        with self._lock:
+            self._remember(url, entry)
+            self._save(url, entry)
+            self.stats["stores"] += 1
+        return entry
+
+    def revalidated(self, url, entry):
+        """Upstream answered 304 Not Modified: extend the entry's lifetime."""
+        ttl = ttl_for(url, entry.data)
+        now = time.time()
+        entry.fetched_at = now
+        entry.expires_at = None if ttl is IMMUTABLE else now + ttl
+        with self._lock:
+            self._remember(url, entry)
+            self._save(url, entry)
+            self.stats["revalidated"] += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
@@ -1,24 +1,226 @@
 # api_functions.py
+import os
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
 import requests
 import json
+from api_cache import ResponseCache
+from http_client import ErgastSession, SingleFlight, CircuitBreaker, RETRY_STATUSES
+from snapshot import SnapshotStore
+from round_index import ROUND_INDEX
+from metrics import METRICS
 
 # ========================================
 # API HELPER FUNCTIONS
 # ========================================
 
+# Ergast-compatible endpoint (override with ERGAST_BASE_URL, e.g. a mirror or a local stand-in)
+BASE_URL = os.environ.get("ERGAST_BASE_URL", "http://ergast.com/api/f1")
+
+# Shared by every get_* function (memory LRU + SQLite file)
+response_cache = ResponseCache()
+
+# Local season database built by snapshot.py (None until one is ingested)
+snapshot_store = SnapshotStore.open_if_exists()
+
+# Pooled keep-alive connections, retries on 429/5xx and client-side rate limiting.
+# session.timings holds the per-call timing records.
+session = ErgastSession()
+
+# Fails fast (and serves stale data) while Ergast keeps failing
+breaker = CircuitBreaker()
+
+def reconnect(share=1):
+    """
+    Replaces the cache, snapshot and HTTP session with fresh connections.
+    Called in forked server workers: SQLite connections and keep-alive
+    sockets must not be shared between processes. Each rate-limit window
+    is stretched by `share` so that `share` workers together stay within
+    the quota of a single process.
+    """
+    global response_cache, snapshot_store, session
+    response_cache = ResponseCache(response_cache.path, response_cache.max_entries)
+    if snapshot_store is not None:
+        snapshot_store = SnapshotStore(snapshot_store.path)
+    session = ErgastSession(rate_limits=[(limiter.limit, limiter.period * share)
+                                         for limiter in session.rate_limiters], max_wait=session.max_wait)
+
+def endpoint_of(url):
+    """
+    Metrics label of an Ergast URL: the path with seasons, rounds and
+    driver ids replaced, e.g. "{season}/{round}/results".
+    """
+    path = url.split("/api/f1/", 1)[-1].split("?", 1)[0]
+    path = re.sub(r"\.json$", "", path)
+    path = re.sub(r"(^|/)drivers/[^/]+", r"\1drivers/{driver}", path)
+    path = re.sub(r"(^|/)(\d{4}|current)(?=/|$)", r"\1{season}", path)
+    return re.sub(r"(^|/)(\d+|last)(?=/|$)", r"\1{round}", path)
+
+# Identical requests in flight at the same time share one upstream call
+inflight = SingleFlight()
+
+# time.monotonic() by which the current message must be answered, or None
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline(seconds):
+    """get_* calls made inside the block give up waiting for Ergast after `seconds` in total"""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining_budget():
+    """Seconds left before the current deadline, or None without one"""
+    end = _deadline.get()
+    return None if end is None else max(0.0, end - time.monotonic())
+
+# Requests that outlive their deadline finish here and refresh the cache
+_refresh_pool = None
+_refresh_pool_lock = threading.Lock()
+
+def _get_refresh_pool():
+    global _refresh_pool
+    if _refresh_pool is None:
+        with _refresh_pool_lock:
+            if _refresh_pool is None:
+                _refresh_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ergast-refresh")
+    return _refresh_pool
+
+# Requests queued or running in the refresh pool at most; past that (Ergast
+# stalled for everyone), callers get stale data without queueing another one
+MAX_PENDING_REFRESHES = 32
+_pending_refreshes = threading.BoundedSemaphore(MAX_PENDING_REFRESHES)
+
+def _submit_refresh(fn):
+    """Future of fn on the refresh pool, or None when MAX_PENDING_REFRESHES are pending already"""
+    if not _pending_refreshes.acquire(blocking=False):
+        return None
+    future = _get_refresh_pool().submit(fn)
+    future.add_done_callback(lambda _: _pending_refreshes.release())
+    return future
+
+def _forget_refresh_pool():
+    # The pool's threads (and the requests they were running) don't survive a fork
+    global _refresh_pool, _refresh_pool_lock, _pending_refreshes
+    _refresh_pool, _refresh_pool_lock = None, threading.Lock()
+    _pending_refreshes = threading.BoundedSemaphore(MAX_PENDING_REFRESHES)
+
+os.register_at_fork(after_in_child=_forget_refresh_pool)
+
+def serve_stale(url, parse, *args):
+    """
+    The last known good payload of url, parsed and marked {"stale": True},
+    for when Ergast can't answer in time; None if there is none.
+    """
+    cached = response_cache.peek(url)
+    if cached is not None:
+        result = parse(cached.data, *args)
+        if "error" not in result:
+            METRICS.inc("f1_stale_responses_total", endpoint=endpoint_of(url))
+            return dict(result, stale=True, fetched_at=cached.fetched_at)
+    return None
+
+def fetch(url, parse, *args):
+    """
+    parse(get_json_response(url), *args), shared with every concurrent caller
+    of the same url: a burst of "who won the last race?" right after the
+    flag makes one Ergast request and parses it once.
+    Each url is always parsed by the same function, so the url is the key.
+
+    Inside deadline(), a request that can't finish in the remaining budget
+    keeps running in the background (refreshing the cache for the next
+    caller) while this one gets serve_stale(); so does a failed request.
+    """
+    def load():
+        return inflight.do(url, lambda: parse(get_json_response(url), *args))
+
+    budget = remaining_budget()
+    cached = response_cache.peek(url) if budget is not None else None
+    if budget is None or (cached is not None and cached.is_fresh()):
+        result, shared = load()
+    else:
+        future = _submit_refresh(load)
+        if future is None:
+            METRICS.inc("f1_refresh_rejected_total", endpoint=endpoint_of(url))
+            return serve_stale(url, parse, *args) or {"error": "Ergast is not responding right now"}
+        try:
+            result, shared = future.result(timeout=budget)
+        except FutureTimeout:
+            METRICS.inc("f1_deadline_exceeded_total", endpoint=endpoint_of(url))
+            return serve_stale(url, parse, *args) or {"error": "Ergast is not responding right now"}
+
+    if shared:
+        METRICS.inc("f1_coalesced_requests_total", endpoint=endpoint_of(url))
+    if "error" in result:
+        return serve_stale(url, parse, *args) or result
+    return result
+
 def get_json_response(url):
     """
-    Makes API request and returns JSON data.
+    Returns JSON data for url, from the cache when it is still fresh.
+    Expired entries are revalidated with a conditional request.
     Handles errors gracefully.
+    Counted in f1_ergast_responses_total{endpoint, outcome}.
     """
+    endpoint = endpoint_of(url)
+    cached = response_cache.lookup(url)
+    if cached is not None and cached.is_fresh():
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="cache")
+        return cached.data
+
+    if not breaker.allow():
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="circuit_open")
+        return None
+
+    headers = cached.validators() if cached is not None else {}
     try:
-        response = requests.get(url, timeout=10)
+        with METRICS.timed("f1_ergast_request_seconds", f"ergast {endpoint}", endpoint=endpoint):
+            response = session.get(url, headers=headers, max_wait=remaining_budget())
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure()
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="error")
+        print(f"API Error: {e}")
+        return None
+    except BaseException:
+        # Every allowed request must report back: a half-open breaker waits for its trial
+        breaker.record_failure()
+        raise
+
+    # 4xx answers (other than 429) mean Ergast is up
+    if response.status_code in RETRY_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    try:
+        if response.status_code == 304 and cached is not None:
+            METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="revalidated")
+            return response_cache.revalidated(url, cached).data
         response.raise_for_status()  # Raise error for bad status codes
-        return response.json()
+        data = response.json()
     except requests.exceptions.RequestException as e:
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="error")
         print(f"API Error: {e}")
         return None
 
+    METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="fetched")
+    response_cache.store(url, data, response.headers)
+    return data
+
+def from_snapshot(query, *args):
+    """
+    Answers from the offline snapshot store when it covers the request.
+    Returns the same dict as the matching get_* function, or None.
+    """
+    if snapshot_store is None:
+        return None
+    return getattr(snapshot_store, query)(*args)
+
 # ========================================
 # FUNCTION 1: Get Last Race Results
 # ========================================
@@ -30,9 +232,11 @@ def get_last_race_results():
     Returns:
         dict with winner, race name, date, top 3
     """
-    url = "http://ergast.com/api/f1/current/last/results.json"
-    data = get_json_response(url)
-    
+    url = f"{BASE_URL}/current/last/results.json"
+    return fetch(url, parse_last_race_results)
+
+def parse_last_race_results(data):
+    """Turns the Ergast JSON of get_last_race_results into its result dict"""
     if not data:
         return {"error": "Could not fetch race data"}
     
@@ -71,9 +275,11 @@ def get_next_race():
     Returns:
         dict with race name, date, circuit, country
     """
-    url = "http://ergast.com/api/f1/current/next.json"
-    data = get_json_response(url)
-    
+    url = f"{BASE_URL}/current/next.json"
+    return fetch(url, parse_next_race)
+
+def parse_next_race(data):
+    """Turns the Ergast JSON of get_next_race into its result dict"""
     if not data:
         return {"error": "Could not fetch next race data"}
     
@@ -104,9 +310,15 @@ def get_driver_standings(year='current'):
     Returns:
         list of drivers with positions, points, wins
     """
-    url = f"http://ergast.com/api/f1/{year}/driverStandings.json"
-    data = get_json_response(url)
-    
+    offline = from_snapshot('driver_standings', year)
+    if offline:
+        return offline
+
+    url = f"{BASE_URL}/{year}/driverStandings.json"
+    return fetch(url, parse_driver_standings)
+
+def parse_driver_standings(data):
+    """Turns the Ergast JSON of get_driver_standings into its result dict"""
     if not data:
         return {"error": "Could not fetch standings"}
     
@@ -145,9 +357,15 @@ def get_constructor_standings(year='current'):
     Returns:
         list of constructors with positions, points, wins
     """
-    url = f"http://ergast.com/api/f1/{year}/constructorStandings.json"
-    data = get_json_response(url)
-    
+    offline = from_snapshot('constructor_standings', year)
+    if offline:
+        return offline
+
+    url = f"{BASE_URL}/{year}/constructorStandings.json"
+    return fetch(url, parse_constructor_standings)
+
+def parse_constructor_standings(data):
+    """Turns the Ergast JSON of get_constructor_standings into its result dict"""
     if not data:
         return {"error": "Could not fetch constructor standings"}
     
@@ -186,9 +404,15 @@ def get_driver_info(driver_id):
     Returns:
         dict with driver details
     """
-    url = f"http://ergast.com/api/f1/drivers/{driver_id}.json"
-    data = get_json_response(url)
-    
+    offline = from_snapshot('driver_info', driver_id)
+    if offline:
+        return offline
+
+    url = f"{BASE_URL}/drivers/{driver_id}.json"
+    return fetch(url, parse_driver_info)
+
+def parse_driver_info(data):
+    """Turns the Ergast JSON of get_driver_info into its result dict"""
     if not data:
         return {"error": "Could not fetch driver info"}
     
@@ -220,9 +444,15 @@ def get_race_schedule(year='current'):
     Returns:
         list of races with dates and locations
     """
-    url = f"http://ergast.com/api/f1/{year}.json"
-    data = get_json_response(url)
-    
+    offline = from_snapshot('race_schedule', year)
+    if offline:
+        return offline
+
+    url = f"{BASE_URL}/{year}.json"
+    return fetch(url, parse_race_schedule, year)
+
+def parse_race_schedule(data, year):
+    """Turns the Ergast JSON of get_race_schedule into its result dict"""
     if not data:
         return {"error": "Could not fetch race schedule"}
     
@@ -236,7 +466,8 @@ def get_race_schedule(year='current'):
                 "race_name": race['raceName'],
                 "date": race['date'],
                 "circuit": race['Circuit']['circuitName'],
-                "country": race['Circuit']['Location']['country']
+                "country": race['Circuit']['Location']['country'],
+                "locality": race['Circuit']['Location'].get('locality', "")
             })
         
         return {
@@ -262,9 +493,28 @@ def get_race_winner(year, round_number):
     Returns:
         dict with winner info
     """
-    url = f"http://ergast.com/api/f1/{year}/{round_number}/results.json"
-    data = get_json_response(url)
-    
+    offline = from_snapshot('race_winner', year, round_number)
+    if offline:
+        return offline
+
+    url = f"{BASE_URL}/{year}/{round_number}/results.json"
+    return fetch(url, parse_race_winner)
+
+def get_race_winner_by_name(year, race):
+    """
+    get_race_winner for a race given by name ("Monaco", "Spa"), resolved to
+    its round with round_index.ROUND_INDEX (one schedule fetch per season).
+
+    Returns:
+        the get_race_winner dict, or {"error", "unknown_race": race} when no round matches
+    """
+    round_number = ROUND_INDEX.lookup(year, race)
+    if not round_number:
+        return {"error": f"No round of {year} matches {race}", "unknown_race": race}
+    return get_race_winner(year, round_number)
+
+def parse_race_winner(data):
+    """Turns the Ergast JSON of get_race_winner into its result dict"""
     if not data:
         return {"error": "Could not fetch race results"}
     
@@ -280,4 +530,4 @@ def get_race_winner(year, round_number):
             "team": winner['Constructor']['name']
         }
     except (KeyError, IndexError):
-        return {"error": "Race not found or not completed yet"}
\ No newline at end of file
+        return {"error": "Race not found or not completed yet"}
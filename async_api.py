@@ -0,0 +1,322 @@
+"""
+Asyncio variants of the api_functions get_* functions.
+Same URLs, cache, rate limits and return shapes as the blocking versions,
+but requests go through a shared aiohttp session so one event loop can
+serve many conversations while Ergast is slow.
+"""
+import asyncio
+import random
+import time
+
+import aiohttp
+
+import api_functions
+from api_functions import (
+    parse_last_race_results, parse_next_race, parse_driver_standings,
+    parse_constructor_standings, parse_driver_info, parse_race_schedule, parse_race_winner
+)
+from http_client import RETRY_STATUSES, CallTiming, RateLimited
+from round_index import ROUND_INDEX
+from metrics import METRICS
+
+
+class AsyncErgastClient:
+    """
+    aiohttp counterpart of http_client.ErgastSession (pooling, retries with
+    jittered backoff on 429/5xx, rate limiting). By default it shares the
+    blocking session's rate limiters so both paths count against one quota.
+    """
+
+    def __init__(self, pool_size=100, max_retries=3, backoff=0.5, max_backoff=8.0, timeout=10,
+                 rate_limiters=None, max_wait=30.0):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.rate_limiters = rate_limiters
+        self.max_wait = max_wait
+        self.timings = api_functions.session.timings
+        self._session = None
+        self._loop = None  # the event loop _session belongs to
+        self._closer = None  # task closing _session when its loop shuts down
+
+    def _limiters(self):
+        if self.rate_limiters is not None:
+            return self.rate_limiters
+        return api_functions.session.rate_limiters
+
+    async def _acquire(self, max_wait):
+        # Like http_client.acquire_all, without blocking the event loop
+        give_up_at = None if max_wait is None else time.monotonic() + max_wait
+        taken = []
+        try:
+            for limiter in self._limiters():
+                while True:
+                    wait, token = limiter.take()
+                    if token is not None:
+                        taken.append((limiter, token))
+                        break
+                    if give_up_at is not None and time.monotonic() + wait > give_up_at:
+                        raise limiter.refuse(wait)
+                    await asyncio.sleep(wait)
+        except BaseException:
+            for limiter, token in taken:
+                limiter.release(token)
+            raise
+
+    def _backoff_delay(self, attempt, headers=None):
+        retry_after = (headers or {}).get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def get(self, url, headers=None, max_wait=None):
+        """
+        GETs url with retries. Raises RateLimited rather than waiting more
+        than max_wait (or the client's own max_wait) for a rate-limit slot.
+
+        Returns:
+            (status, response headers, parsed JSON or None)
+        """
+        if max_wait is None or (self.max_wait is not None and self.max_wait < max_wait):
+            max_wait = self.max_wait
+        # A session only works on the event loop it was created on, and each
+        # asyncio.run() call has a new one
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and self._loop.is_closed():
+                # A loop closed without cancelling its tasks: its sockets went
+                # with it, this only marks the session closed
+                await self._session.close()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size), timeout=self.timeout
+            )
+            self._loop = loop
+            self._closer = loop.create_task(_close_on_shutdown(self._session))
+
+        start = time.perf_counter()
+        waited = 0.0
+        status = None
+        attempt = 0
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                await self._acquire(max_wait)
+                waited += time.perf_counter() - wait_start
+
+                response_headers = None
+                try:
+                    async with self._session.get(url, headers=headers) as response:
+                        status = response.status
+                        response_headers = response.headers
+                        if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                            data = await response.json(content_type=None) if status == 200 else None
+                            return status, response_headers, data
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt >= self.max_retries:
+                        raise
+
+                delay = self._backoff_delay(attempt, response_headers)
+                await asyncio.sleep(delay)
+                waited += delay
+                attempt += 1
+        finally:
+            self.timings.append(CallTiming(url, status, attempt + 1, time.perf_counter() - start, waited))
+
+    async def close(self):
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+            self._closer.cancel()
+        self._session = None
+        self._loop = None
+        self._closer = None
+
+
+async def _close_on_shutdown(session):
+    # Waits until cancelled: asyncio.run() cancels the tasks still pending when
+    # its coroutine returns, so the session is closed on its own loop
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await session.close()
+
+
+# Shared by every async get_* function; opens a new aiohttp session per event loop
+client = AsyncErgastClient()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio version of http_client.SingleFlight: concurrent do(key, coroutine
+    function) calls with the same key await one task. The task is shielded,
+    so a cancelled caller doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}  # key -> task
+
+    async def do(self, key, fn, *args):
+        """Returns (result, shared) where shared is True if another caller started the task"""
+        task = self._tasks.get(key)
+        shared = task is not None and task.get_loop() is asyncio.get_running_loop()
+        if not shared:
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+
+            def forget(done):
+                if self._tasks.get(key) is done:
+                    del self._tasks[key]
+
+            task.add_done_callback(forget)
+        return await asyncio.shield(task), shared
+
+
+# Identical requests in flight at the same time share one upstream call
+inflight = AsyncSingleFlight()
+
+
+async def fetch(url, parse, *args):
+    """
+    Async version of api_functions.fetch: one request and one parse per url
+    in flight, and stale data when the request outlives api_functions.deadline()
+    (the shielded task keeps running and refreshes the cache) or fails.
+    """
+    async def fetch_and_parse():
+        return parse(await get_json_response(url), *args)
+
+    budget = api_functions.remaining_budget()
+    cached = await asyncio.to_thread(api_functions.response_cache.peek, url) if budget is not None else None
+    try:
+        if budget is None or (cached is not None and cached.is_fresh()):
+            result, shared = await inflight.do(url, fetch_and_parse)
+        else:
+            result, shared = await asyncio.wait_for(inflight.do(url, fetch_and_parse), budget)
+    except asyncio.TimeoutError:
+        METRICS.inc("f1_deadline_exceeded_total", endpoint=api_functions.endpoint_of(url))
+        return (await asyncio.to_thread(api_functions.serve_stale, url, parse, *args)
+                or {"error": "Ergast is not responding right now"})
+
+    if shared:
+        METRICS.inc("f1_coalesced_requests_total", endpoint=api_functions.endpoint_of(url))
+    if "error" in result:
+        return await asyncio.to_thread(api_functions.serve_stale, url, parse, *args) or result
+    return result
+
+
+async def get_json_response(url):
+    """
+    Async version of api_functions.get_json_response (same cache and revalidation).
+    The cache's SQLite reads and writes run on worker threads, off the event loop.
+    Handles errors gracefully.
+    """
+    response_cache = api_functions.response_cache
+    endpoint = api_functions.endpoint_of(url)
+    cached = await asyncio.to_thread(response_cache.lookup, url)
+    if cached is not None and cached.is_fresh():
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="cache")
+        return cached.data
+
+    breaker = api_functions.breaker
+    if not breaker.allow():
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="circuit_open")
+        return None
+
+    headers = cached.validators() if cached is not None else {}
+    try:
+        with METRICS.timed("f1_ergast_request_seconds", f"ergast {endpoint}", endpoint=endpoint):
+            status, response_headers, data = await client.get(url, headers=headers,
+                                                               max_wait=api_functions.remaining_budget())
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, RateLimited, RuntimeError) as e:
+        # RuntimeError: aiohttp's "Session is closed" / "Event loop is closed"
+        breaker.record_failure()
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="error")
+        print(f"API Error: {e}")
+        return None
+    except BaseException:
+        # Cancellation included (asyncio.run cancels leftover refresh tasks): a
+        # half-open breaker waits for its trial to report back
+        breaker.record_failure()
+        raise
+
+    # 4xx answers (other than 429) mean Ergast is up
+    if status in RETRY_STATUSES:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+    if status == 304 and cached is not None:
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="revalidated")
+        return (await asyncio.to_thread(response_cache.revalidated, url, cached)).data
+    if status != 200:
+        METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="error")
+        print(f"API Error: {status} for url: {url}")
+        return None
+
+    METRICS.inc("f1_ergast_responses_total", endpoint=endpoint, outcome="fetched")
+    await asyncio.to_thread(response_cache.store, url, data, response_headers)
+    return data
+
+
+async def from_snapshot(query, *args):
+    """api_functions.from_snapshot on a worker thread (it reads SQLite)"""
+    return await asyncio.to_thread(api_functions.from_snapshot, query, *args)
+
+
+async def get_last_race_results():
+    url = f"{api_functions.BASE_URL}/current/last/results.json"
+    return await fetch(url, parse_last_race_results)
+
+
+async def get_next_race():
+    url = f"{api_functions.BASE_URL}/current/next.json"
+    return await fetch(url, parse_next_race)
+
+
+async def get_driver_standings(year='current'):
+    offline = await from_snapshot('driver_standings', year)
+    if offline:
+        return offline
+    url = f"{api_functions.BASE_URL}/{year}/driverStandings.json"
+    return await fetch(url, parse_driver_standings)
+
+
+async def get_constructor_standings(year='current'):
+    offline = await from_snapshot('constructor_standings', year)
+    if offline:
+        return offline
+    url = f"{api_functions.BASE_URL}/{year}/constructorStandings.json"
+    return await fetch(url, parse_constructor_standings)
+
+
+async def get_driver_info(driver_id):
+    offline = await from_snapshot('driver_info', driver_id)
+    if offline:
+        return offline
+    url = f"{api_functions.BASE_URL}/drivers/{driver_id}.json"
+    return await fetch(url, parse_driver_info)
+
+
+async def get_race_schedule(year='current'):
+    offline = await from_snapshot('race_schedule', year)
+    if offline:
+        return offline
+    url = f"{api_functions.BASE_URL}/{year}.json"
+    return await fetch(url, parse_race_schedule, year)
+
+
+async def get_race_winner(year, round_number):
+    offline = await from_snapshot('race_winner', year, round_number)
+    if offline:
+        return offline
+    url = f"{api_functions.BASE_URL}/{year}/{round_number}/results.json"
+    return await fetch(url, parse_race_winner)
+
+
+async def get_race_winner_by_name(year, race):
+    if ROUND_INDEX.needs_schedule(year, race):
+        ROUND_INDEX.add_schedule(year, await get_race_schedule(str(year)))
+    round_number = ROUND_INDEX.cached(year, race)
+    if not round_number:
+        return {"error": f"No round of {year} matches {race}", "unknown_race": race}
+    return await get_race_winner(year, round_number)
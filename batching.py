@@ -0,0 +1,97 @@
+"""
+Micro-batching for intent classification.
+Collects single requests from concurrent callers and runs them through a
+batch function (e.g. chatbot.predict_batch) in one call.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many threads into batches.
+
+    A batch is flushed as soon as it holds max_batch_size items, or when
+    max_wait_ms has passed since its first item arrived. A larger window
+    gives bigger batches (throughput), a smaller one answers sooner
+    (latency); max_wait_ms=0 only batches requests that are already queued.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future for its result."""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        """Blocking shortcut: submit an item and wait for its result."""
+        return self.submit(item).result()
+
+    def close(self):
+        """Flushes what is queued and stops the worker thread."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def _collect(self):
+        """Blocks for the first item, then gathers more until the batch is full or the window ends."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            # Cancelled futures are dropped; the others can't be cancelled from now on
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.batch_fn(items))
+                if len(results) != len(batch):
+                    raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    _resolve(future, exception=e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                _resolve(future, result)
+
+
+def _resolve(future, result=None, exception=None):
+    # Never lets a future's state stop the worker thread (every later submit() would hang)
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
@@ -0,0 +1,557 @@
+"""
+Micro-benchmarks for the F1 chatbot pipeline.
+Usage: python benchmark.py <name> [<name> ...]   (no name runs them all)
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from functools import partial
+
+# A mix of dictionary hits, spaCy-only entities and entity-free messages
+SAMPLE_QUERIES = [
+    "Hello there",
+    "When is the next race?",
+    "Who won the last race?",
+    "Show me 2020 driver standings",
+    "Tell me about Max Verstappen",
+    "How is Ferrari doing this year?",
+    "Who won round 5 in 2021?",
+    "Who won Monaco 2021?",
+    "What about Antonio Giovinazzi?",
+    "Tell me about Mick",
+    "How does DRS work?",
+    "constructor standings 2019",
+    "Thanks a lot",
+]
+
+
+def start_stand_in_ergast(delay=0.05):
+    """
+    Serves a canned Ergast next-race payload on localhost after `delay` seconds.
+    Returns the server; its hit count is server.hits and its delay server.delay.
+    """
+    import json
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    body = json.dumps({"MRData": {"RaceTable": {"Races": [{
+        "season": "2025", "round": "8", "raceName": "Monaco Grand Prix",
+        "date": "2025-05-25", "time": "13:00:00Z",
+        "Circuit": {"circuitName": "Circuit de Monaco",
+                    "Location": {"locality": "Monte-Carlo", "country": "Monaco"}},
+    }]}}}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with server.lock:
+                server.hits += 1
+            time.sleep(server.delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.hits = 0
+    server.delay = delay
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def use_stand_in_ergast(server):
+    """Points api_functions at a stand-in server, with no cache and no rate limits."""
+    import api_functions
+    from api_cache import ResponseCache
+    from http_client import ErgastSession
+
+    api_functions.BASE_URL = f"http://127.0.0.1:{server.server_port}/api/f1"
+    api_functions.response_cache = ResponseCache(path=None, max_entries=0)
+    api_functions.session = ErgastSession(pool_size=64, rate_limits=())
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(fn, inputs, repeat=20):
+    """Calls fn once per input, `repeat` times over, and returns per-call times in ms."""
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    print(f"{label:<40} p50 {percentile(samples, 50):8.3f} ms   p99 {percentile(samples, 99):8.3f} ms")
+
+
+### BENCHMARKS ###
+
+def bench_entities():
+    """Entity extraction: one spaCy parse per extractor, one shared parse, and only the handler's entities."""
+    from chatbot import (predict, extract_driver_hybrid, extract_team_hybrid, extract_race_hybrid,
+                         predict_with_entities)
+    from advanced_ner import extract_entities_spacy, extract_entities_spacy_batch
+    from handlers import ENTITY_NAMES
+
+    def separate_parses(text):
+        predict(text)
+        extract_driver_hybrid(text)
+        extract_team_hybrid(text)
+        extract_race_hybrid(text)
+
+    report("predict + hybrids, parse each", time_calls(separate_parses, SAMPLE_QUERIES))
+    report("predict_with_entities, all entities", time_calls(partial(predict_with_entities, needed=ENTITY_NAMES),
+                                                            SAMPLE_QUERIES))
+    report("predict_with_entities, handler's only", time_calls(predict_with_entities, SAMPLE_QUERIES))
+    report("extract_entities_spacy", time_calls(extract_entities_spacy, SAMPLE_QUERIES))
+
+    start = time.perf_counter()
+    extract_entities_spacy_batch(SAMPLE_QUERIES * 20)
+    per_message = (time.perf_counter() - start) * 1000 / (len(SAMPLE_QUERIES) * 20)
+    print(f"{'extract_entities_spacy_batch':<40} {per_message:8.3f} ms/message")
+
+
+def bench_gazetteer():
+    """Entity lookup: sorted-key substring scan (before) vs compiled gazetteer, as aliases grow."""
+    from gazetteer import Gazetteer
+    from utils import F1_DRIVERS, F1_TEAMS, F1_RACES
+
+    def substring_scan(dictionary, text):
+        text_lower = text.lower()
+        for key in sorted(dictionary, key=len, reverse=True):
+            if key in text_lower:
+                return dictionary[key]
+        return None
+
+    for extra in (0, 1000, 10000):
+        drivers = dict(F1_DRIVERS)
+        drivers.update({f"historic driver {i}": f"Historic Driver {i}" for i in range(extra)})
+        dictionaries = {"driver": drivers, "team": F1_TEAMS, "race": F1_RACES}
+        gazetteer = Gazetteer(dictionaries)
+
+        def scan_all(text):
+            for dictionary in dictionaries.values():
+                substring_scan(dictionary, text)
+
+        size = sum(len(d) for d in dictionaries.values())
+        report(f"substring scan, {size} aliases", time_calls(scan_all, SAMPLE_QUERIES, repeat=5))
+        report(f"gazetteer, {size} aliases", time_calls(gazetteer.find, SAMPLE_QUERIES, repeat=5))
+
+
+def bench_featurizer():
+    """Bag-of-words row: dense list comprehension (before) vs indexed BagOfWords, as vocabulary grows."""
+    import torch
+    from utils import BagOfWords
+
+    sentence_words = ["who", "won", "the", "last", "race", "in", "monaco"]
+    for size in (500, 5000, 50000):
+        words = sorted({f"word{i}" for i in range(size)} | set(sentence_words))
+        bag_of_words = BagOfWords(words)
+
+        def dense(tokens):
+            torch.FloatTensor([1 if word in tokens else 0 for word in words]).unsqueeze(0)
+
+        def indexed(tokens):
+            torch.from_numpy(bag_of_words.transform([tokens]))
+
+        report(f"dense list, vocab {len(words)}", time_calls(dense, [sentence_words], repeat=50))
+        report(f"BagOfWords, vocab {len(words)}", time_calls(indexed, [sentence_words], repeat=50))
+
+
+def bench_clean_text(repeat=20):
+    """Text normalization over the intents.json patterns: re.sub + word_tokenize + lemmatize (before) vs clean_text."""
+    import json
+    import re
+    import nltk
+    import utils
+
+    with open("intents.json", "r", encoding="utf-8") as f:
+        sentences = [pattern for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+    sentences += SAMPLE_QUERIES
+    tokens = sum(len(utils.clean_text(sentence)) for sentence in sentences)
+
+    def nltk_pipeline(sentence):
+        sentence = re.sub(r'[^a-z\s]', "", sentence.lower())
+        return [utils.lemmatizer.lemmatize(word) for word in nltk.word_tokenize(sentence)]
+
+    for label, fn in (("re.sub + word_tokenize + lemmatize", nltk_pipeline), ("clean_text", utils.clean_text)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for sentence in sentences:
+                fn(sentence)
+        rate = tokens * repeat / (time.perf_counter() - start)
+        print(f"{label:<40} {rate:10.0f} tokens/sec")
+
+
+def bench_pattern_index(queries=200):
+    """Low-confidence fallback: nearest-pattern lookup as the number of patterns grows."""
+    import json
+    import random
+    from pattern_index import PatternIndex
+    from utils import clean_text
+
+    with open("intents.json", "r", encoding="utf-8") as f:
+        documents = [(clean_text(pattern), intent['tag'])
+                     for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+    # Synthetic patterns: 5 words each from the real vocabulary plus 5000 filler words
+    vocabulary = sorted({token for tokens, _ in documents for token in tokens}) + [f"word{i}" for i in range(5000)]
+    tags = sorted({tag for _, tag in documents})
+    messages = [clean_text(query) for query in SAMPLE_QUERIES]
+
+    rng = random.Random(0)
+    for size in (len(documents), 10000, 100000):
+        synthetic = [(rng.sample(vocabulary, 5), rng.choice(tags)) for _ in range(size - len(documents))]
+        start = time.perf_counter()
+        index = PatternIndex.build(documents + synthetic)
+        build_ms = (time.perf_counter() - start) * 1000
+        report(f"classify, {len(index)} patterns", time_calls(index.classify, messages, repeat=queries // len(messages)))
+        print(f"{'  build':<40} {build_ms:8.1f} ms")
+
+
+def bench_training(sizes=(1000, 5000, 20000), epochs=3):
+    """Training wall time vs number of patterns: minibatch SGD vs full-batch, dense vs sparse design matrix."""
+    import json
+    import random
+    import torch
+    import train
+    from network import Neural_Network
+    from utils import BagOfWords, clean_text
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    # One-off costs (thread pools, sparse kernels) shouldn't land in the first measurement
+    for warmup in (torch.eye(4), torch.eye(4).to_sparse()):
+        train.train_model(Neural_Network(4, 4), warmup, torch.arange(4), epochs=2, full_batch=True)
+    with open("intents.json", "r", encoding="utf-8") as f:
+        documents = [(clean_text(pattern), intent['tag'], pattern)
+                     for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+    tags = sorted({tag for _, tag, _ in documents})
+
+    # Synthetic patterns of 6 words; the vocabulary grows with the data as it would from logs
+    rng = random.Random(0)
+    for size in (len(documents),) + sizes:
+        vocabulary = [f"word{i}" for i in range(max(500, size // 4))]
+        patterns = documents + [([rng.choice(vocabulary) for _ in range(6)], rng.choice(tags), "")
+                                for _ in range(size - len(documents))]
+        words = sorted({token for tokens, _, _ in patterns for token in tokens})
+        bag_of_words = BagOfWords(words)
+        class_index = {tag: i for i, tag in enumerate(tags)}
+        print(f"{len(patterns)} patterns, {len(words)} words")
+
+        for sparse in (False, True):
+            start = time.perf_counter()
+            X, y = train.to_tensors(patterns, bag_of_words, class_index, sparse=sparse)
+            build_ms = (time.perf_counter() - start) * 1000
+            layout = "sparse" if sparse else "dense"
+            print(f"{f'  {layout} design matrix':<40} {build_ms:8.1f} ms")
+
+            modes = [("full batch", True)] + ([("batch 8", False)] if size <= 5000 else [])
+            for mode, full_batch in modes:
+                model = Neural_Network(len(words), len(tags))
+                start = time.perf_counter()
+                train.train_model(model, X, y, epochs=epochs, full_batch=full_batch)
+                per_epoch = (time.perf_counter() - start) * 1000 / epochs
+                print(f"{f'  {layout}, {mode}':<40} {per_epoch:8.1f} ms/epoch")
+
+
+def bench_batching(callers=32, messages_per_caller=100):
+    """Intent classification throughput with concurrent callers: predict() per call vs MicroBatcher windows."""
+    import threading
+    from chatbot import predict, predict_batch
+    from batching import MicroBatcher
+
+    def run(classify):
+        def caller():
+            for i in range(messages_per_caller):
+                classify(SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)])
+
+        threads = [threading.Thread(target=caller) for _ in range(callers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return callers * messages_per_caller / (time.perf_counter() - start)
+
+    print(f"{'predict() per message':<40} {run(predict):10.0f} messages/sec")
+    for max_wait_ms in (0, 1, 2, 5, 10):
+        for max_batch_size in (8, 32):
+            batcher = MicroBatcher(predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+            label = f"window {max_wait_ms} ms, batch <= {max_batch_size}"
+            print(f"{label:<40} {run(batcher):10.0f} messages/sec")
+            batcher.close()
+
+
+def bench_async(conversations=200, delay=0.05):
+    """Concurrent conversations against a stand-in Ergast with 50 ms latency: sync vs async generate_response."""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    import chatbot
+    import async_api
+
+    server = start_stand_in_ergast(delay)
+    use_stand_in_ergast(server)
+    async_api.client = async_api.AsyncErgastClient(pool_size=conversations, rate_limiters=[])
+    messages = ["When is the next race?"] * conversations
+
+    start = time.perf_counter()
+    for message in messages[:20]:
+        chatbot.generate_response(message)
+    rate = 20 / (time.perf_counter() - start)
+    print(f"{'sync, one thread':<40} {rate:10.1f} conversations/sec")
+
+    for workers in (8, 32):
+        with ThreadPoolExecutor(workers) as pool:
+            start = time.perf_counter()
+            list(pool.map(chatbot.generate_response, messages))
+            rate = conversations / (time.perf_counter() - start)
+        print(f"{f'sync, {workers} threads':<40} {rate:10.1f} conversations/sec")
+
+    async def run_async():
+        start = time.perf_counter()
+        await asyncio.gather(*(chatbot.generate_response_async(m) for m in messages))
+        rate = conversations / (time.perf_counter() - start)
+        await async_api.client.close()
+        return rate
+
+    print(f"{'async, one event loop':<40} {asyncio.run(run_async()):10.1f} conversations/sec")
+    server.shutdown()
+
+
+def bench_fanout(delay=0.1):
+    """Multi-part questions against a stand-in Ergast with 100 ms latency: calls one after another vs concurrent."""
+    import api_functions
+    import chatbot
+
+    server = start_stand_in_ergast(delay)
+    use_stand_in_ergast(server)
+    messages = ["Race schedule for 2023", "Race schedule for 2022 and 2023",
+                "Race schedule for 2021, 2022 and 2023", "Race schedule for 2023 and 2023"]
+
+    def sequential(message):
+        plans = chatbot.plan_responses(chatbot.predict_with_entities(message))
+        results = {}
+        for reply, api_call in plans:
+            if api_call is not None:
+                results[api_call[0], api_call[1]] = getattr(api_functions, api_call[0])(*api_call[1])
+        return chatbot.merge_replies(plans, results)
+
+    for message in messages:
+        for label, fn in (("sequential", sequential), ("concurrent", chatbot.generate_response)):
+            server.hits = 0
+            samples = time_calls(fn, [message], repeat=5)
+            report(f"{label}: {message!r}"[:40], samples)
+        print(f"{'  Ergast requests per message':<40} {server.hits // 5:8d}")
+    server.shutdown()
+
+
+def cold_start(path):
+    """
+    Loads the model at path and predicts once in a fresh interpreter, as a server
+    worker or the CLI would start. Returns (wall time in ms, peak RSS in MB).
+    """
+    code = (
+        "import resource, chatbot; "
+        f"model, bag_of_words, classes = chatbot.load_model({path!r}); "
+        "model.predict_proba(bag_of_words.transform([['race']])); "
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)"
+    )
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        sys.exit(f"loading {path} failed:\n{result.stderr}")
+    return ms, float(result.stdout.split()[-1])
+
+
+def bench_typos(per_alias=4):
+    """Misspelled entities: recall and latency of the typo index on a seeded typo corpus, vs spaCy."""
+    import json
+    import random
+    from advanced_ner import extract_entities_spacy
+    from typo_index import TypoIndex, MIN_LENGTH, allowed_distance
+    from utils import F1_DRIVERS, F1_TEAMS, F1_RACES
+
+    dictionaries = {"driver": F1_DRIVERS, "team": F1_TEAMS, "race": F1_RACES}
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def misspell(word):
+        i = rng.randrange(len(word) - 1)
+        edit = rng.choice(("delete", "transpose", "substitute", "insert"))
+        if edit == "delete":
+            return word[:i] + word[i + 1:]
+        if edit == "transpose":
+            return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        if edit == "substitute":
+            return word[:i] + rng.choice(letters.replace(word[i], "")) + word[i + 1:]
+        return word[:i] + rng.choice(letters) + word[i:]
+
+    # One edit per typo, two more for aliases long enough to allow them
+    corpus = []
+    for label, entries in dictionaries.items():
+        for alias, name in entries.items():
+            alias = alias.lower()
+            if len(alias) < MIN_LENGTH:
+                continue
+            for _ in range(per_alias):
+                typo = misspell(alias)
+                if allowed_distance(alias) > 1 and rng.random() < 0.5:
+                    typo = misspell(typo)
+                if typo != alias and typo not in entries:
+                    corpus.append((typo, label, name))
+
+    index = TypoIndex(dictionaries)
+    hits = sum(1 for typo, label, name in corpus if (index.find(typo).get(label) or (None,))[0] == name)
+    print(f"recall: {hits}/{len(corpus)} typos ({100 * hits / len(corpus):.1f}%)")
+
+    # Words of the training patterns must not turn into entities
+    with open("intents.json", "r", encoding="utf-8") as f:
+        patterns = [p for intent in json.load(f)['intents'] for p in intent['patterns']]
+    false_positives = [p for p in patterns if index.find(p)]
+    print(f"false positives: {len(false_positives)}/{len(patterns)} patterns {false_positives[:5]}")
+
+    sentences = [f"tell me about {typo}" for typo, _, _ in corpus]
+    report("typo index, uncached", time_calls(lambda text: index._lookup(text, None),
+                                              [typo for typo, _, _ in corpus], repeat=1))
+    report("typo index find, cached", time_calls(index.find, sentences, repeat=5))
+    report("extract_entities_spacy", time_calls(extract_entities_spacy, sentences[:100], repeat=1))
+
+
+def bench_inference(torch_path="model.pth", numpy_path="model.npz"):
+    """Intent model on torch (model.pth) vs NumPy (model.npz): cold start, peak RSS and predict latency."""
+    import chatbot
+
+    for label, path in (("torch", torch_path), ("numpy", numpy_path)):
+        ms, rss_mb = cold_start(path)
+        print(f"{f'{label}: start + load + first predict':<40} {ms:8.1f} ms   peak RSS {rss_mb:6.1f} MB")
+
+    for label, path in (("torch", torch_path), ("numpy", numpy_path)):
+        chatbot.reload_model(path)
+        report(f"{label}: predict", time_calls(chatbot.predict, SAMPLE_QUERIES))
+        report(f"{label}: predict_batch of {len(SAMPLE_QUERIES)}",
+               time_calls(chatbot.predict_batch, [SAMPLE_QUERIES]))
+
+
+def bench_quantization(source="model.pth"):
+    """fp32 vs int8 NumPy export of model.pth: file and weight size, RSS, latency and intents.json accuracy."""
+    import json
+    import tempfile
+    import numpy as np
+    import torch
+    import chatbot
+    from numpy_network import export_numpy, load_numpy_model
+    from utils import clean_text
+
+    data = torch.load(source, weights_only=True)
+    state = {name: tensor.numpy() for name, tensor in data['model_state'].items()}
+    with open("intents.json", "r", encoding="utf-8") as f:
+        labelled = [(clean_text(pattern), intent['tag'])
+                    for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, int8 in (("fp32", False), ("int8", True)):
+            path = os.path.join(directory, f"model_{label}.npz")
+            export_numpy(state, data['words'], data['classes'], path, int8=int8)
+            network, bag_of_words, classes = load_numpy_model(path)
+
+            probabilities = network.predict_proba(bag_of_words.transform([tokens for tokens, _ in labelled]))
+            correct = sum(classes[i] == tag for i, (_, tag) in zip(probabilities.argmax(axis=1), labelled))
+            ms, rss_mb = cold_start(path)
+
+            print(f"{f'{label}: file / weights':<40} {os.path.getsize(path) / 1024:8.1f} KB   "
+                  f"{network.nbytes / 1024:8.1f} KB")
+            print(f"{f'{label}: start + load + first predict':<40} {ms:8.1f} ms   peak RSS {rss_mb:6.1f} MB")
+            print(f"{f'{label}: intents.json accuracy':<40} {correct}/{len(labelled)}")
+            chatbot.reload_model(path)
+            report(f"{label}: predict", time_calls(chatbot.predict, SAMPLE_QUERIES))
+
+    # fc1 grows with the vocabulary: same network shape on random weights
+    rng = np.random.default_rng(0)
+    for size in (10000, 100000):
+        state = {"fc1.weight": rng.normal(0, 0.05, (128, size)), "fc1.bias": np.zeros(128),
+                 "fc2.weight": rng.normal(0, 0.05, (64, 128)), "fc2.bias": np.zeros(64),
+                 "fc3.weight": rng.normal(0, 0.05, (24, 64)), "fc3.bias": np.zeros(24)}
+        words = [f"word{i}" for i in range(size)]
+        bags = np.zeros((1, size), dtype=np.float32)
+        bags[0, rng.choice(size, 6, replace=False)] = 1.0
+        with tempfile.TemporaryDirectory() as directory:
+            for label, int8 in (("fp32", False), ("int8", True)):
+                path = os.path.join(directory, f"model_{label}.npz")
+                export_numpy(state, words, data['classes'], path, int8=int8)
+                network = load_numpy_model(path)[0]
+                samples = time_calls(network.predict_proba, [bags], repeat=200)
+                report(f"{label}, vocab {size}: {network.nbytes / 2**20:.1f} MB weights", samples)
+
+
+# Cumulative `import chatbot` time allowed by the importtime benchmark, in ms.
+# torch, spaCy, the model, intents.json and NLTK data only load in warmup().
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 1000))
+
+
+def bench_importtime(module="chatbot", runs=5):
+    """Cold `import chatbot` time from python -X importtime; exits non-zero over IMPORT_BUDGET_MS."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, cwd=here)
+        if result.returncode != 0:
+            sys.exit(f"import {module} failed:\n{result.stderr}")
+        # "import time: <self us> | <cumulative us> | <module>", one line per module
+        cumulative = {}
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s*\d+ \|\s*(\d+) \| (\s*)(\S+)$", line)
+            if match:
+                cumulative[(len(match.group(2)), match.group(3))] = int(match.group(1)) / 1000
+        samples.append(cumulative[(0, module)])
+
+    # Heaviest direct imports of the module, from the last run
+    children = sorted(((ms, name) for (depth, name), ms in cumulative.items() if depth == 2), reverse=True)
+    for ms, name in children[:5]:
+        print(f"{'  ' + name:<40} {ms:8.1f} ms")
+
+    median = percentile(samples, 50)
+    print(f"{f'import {module}, median of {runs}':<40} {median:8.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    if median > IMPORT_BUDGET_MS:
+        sys.exit(f"import {module} took {median:.1f} ms, over the {IMPORT_BUDGET_MS:.0f} ms budget")
+
+
+BENCHMARKS = {
+    "entities": bench_entities,
+    "gazetteer": bench_gazetteer,
+    "featurizer": bench_featurizer,
+    "clean_text": bench_clean_text,
+    "pattern_index": bench_pattern_index,
+    "training": bench_training,
+    "batching": bench_batching,
+    "async": bench_async,
+    "fanout": bench_fanout,
+    "typos": bench_typos,
+    "inference": bench_inference,
+    "quantization": bench_quantization,
+    "importtime": bench_importtime,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            sys.exit(f"Unknown benchmark '{name}'. Choose from: {', '.join(BENCHMARKS)}")
+        print(f"\n### {name} ###")
+        BENCHMARKS[name]()
@@ -2,63 +2,176 @@
 F1 Chatbot - Interactive Command Line Interface
 Loads pre-trained model and provides real-time F1 information.
 """
+import os
 import re
 import json
 import random
-import torch
-import torch.nn.functional as F
-from utils import clean_text, Neural_Network, F1_DRIVERS, F1_TEAMS, F1_RACES, DRIVER_API_IDS
-from api_functions import (
-    get_last_race_results, get_next_race, get_driver_standings,
-    get_constructor_standings, get_driver_info, get_race_schedule, get_race_winner
-)
-from advanced_ner import extract_entities_spacy
+import itertools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from utils import clean_text, preload_lemmas, BagOfWords
+import api_functions
+from handlers import HANDLERS, ENTITY_NAMES, Handler
+from advanced_ner import extract_entities_spacy, first_entity, get_nlp
+from gazetteer import get_gazetteer
+from typo_index import get_typo_index
+from driver_registry import get_driver_registry
+from hot_responses import HOT_RESPONSES
+from metrics import METRICS
 
 ###LOAD MODEL ###
-print("🏎️  F1 CHATBOT")
-print("="*60)
-print("\n📦 Loading model...")
-
-try : 
-    data = torch.load("model.pth", weights_only=True)
-    words = data['words']
-    classes = data['classes']
-    input_size = data['input_size']
-    output_size = data['output_size']
-    
-    model = Neural_Network(input_size, output_size)
+# The model and intents are loaded on first use (or by warmup()),
+# so importing this module stays fast for tests, tools and worker forks
+_model = None
+_intents = None
+_responses = None
+_pattern_index = None
+_load_lock = threading.Lock()
+
+# Below CONFIDENCE_THRESHOLD the model's intent is not trusted and the message is
+# matched against the intents.json patterns instead (see pattern_index.py);
+# that match is used if its cosine similarity reaches FALLBACK_THRESHOLD
+CONFIDENCE_THRESHOLD = 0.6
+FALLBACK_THRESHOLD = 0.5
+PATTERN_INDEX_PATH = "pattern_index.npz"
+
+def default_model_path():
+    """
+    F1_MODEL_PATH if set, else the NumPy export model.npz when train.py wrote one
+    (no torch import needed), else model.pth.
+    """
+    path = os.environ.get("F1_MODEL_PATH")
+    if path:
+        return path
+    return "model.npz" if os.path.exists("model.npz") else "model.pth"
+
+def _read_model(path):
+    # Both networks expose predict_proba(bags) -> numpy probabilities
+    if path.endswith(".npz"):
+        from numpy_network import load_numpy_model
+        return load_numpy_model(path)
+
+    import torch
+    from network import Neural_Network
+    data = torch.load(path, weights_only=True)
+    model = Neural_Network(data['input_size'], data['output_size'])
     model.load_state_dict(data['model_state'])
     model.eval()
-    
-    print("✅ Model loaded successfully!")
-except FileNotFoundError:
-    print("❌ Error: model.pth not found!")
-    print("Please run 'python train.py' first to train the model.")
-    exit()
+    return model, BagOfWords(data['words']), data['classes']
+
+def load_model(path=None):
+    """Returns (model, bag_of_words, classes), loading the model file on the first call"""
+    global _model
+    if _model is None:
+        with _load_lock:
+            if _model is None:
+                path = path or default_model_path()
+                try :
+                    _model = _read_model(path)
+                except FileNotFoundError:
+                    print(f"❌ Error: {path} not found!")
+                    print("Please run 'python train.py' first to train the model.")
+                    raise SystemExit(1)
+    return _model
+
+def reload_model(path=None):
+    """
+    Loads path and swaps it in for the current model, along with the pattern
+    index saved by the same training run.
+    If loading fails the exception is raised and the current model is kept.
+    """
+    global _model, _pattern_index
+    loaded = _read_model(path or default_model_path())
+    pattern_index = _read_pattern_index()
+    with _load_lock:
+        _model = loaded
+        _pattern_index = pattern_index
+    return loaded
+
+def _read_pattern_index():
+    from pattern_index import PatternIndex
+    try:
+        return PatternIndex.load(PATTERN_INDEX_PATH)
+    except FileNotFoundError:
+        return False  # trained before the index existed: no fallback
 
-# Load intents for responses
-with open("intents.json", "r", encoding="utf-8") as f:
-    intents = json.load(f)
+def load_pattern_index():
+    """Returns the PatternIndex saved by train.py, or None if there is none"""
+    global _pattern_index
+    if _pattern_index is None:
+        with _load_lock:
+            if _pattern_index is None:
+                _pattern_index = _read_pattern_index()
+    return _pattern_index or None
+
+def load_intents(path="intents.json"):
+    """Returns intents.json (used for the default responses), loading it on the first call"""
+    global _intents
+    if _intents is None:
+        with open(path, "r", encoding="utf-8") as f:
+            _intents = json.load(f)
+    return _intents
+
+def _reply_from(responses, entities):
+    return random.choice(responses), None
+
+def load_responses():
+    """{tag: Handler} answering each intents.json tag with one of its responses, built on the first call"""
+    global _responses
+    if _responses is None:
+        _responses = {
+            intent['tag']: Handler(partial(_reply_from, intent['responses']))
+            for intent in load_intents()['intents'] if intent['responses']
+        }
+    return _responses
+
+UNKNOWN_INTENT = Handler(lambda entities: ("I'm not sure how to help with that.", None))
+
+def get_handler(intent):
+    """The Handler registered for intent in handlers.py, else one replying from intents.json"""
+    handler = HANDLERS.get(intent)
+    if handler is None:
+        handler = load_responses().get(intent, UNKNOWN_INTENT)
+    return handler
+
+def warmup():
+    """
+    Loads everything the first message would otherwise pay for:
+    the model, intents, spaCy, the gazetteer and typo index, the NLTK data, the
+    lemmas of the words in the intents.json patterns and the driver registry
+    (downloaded in the background when missing or old).
+    """
+    load_model()
+    load_intents()
+    load_responses()
+    load_pattern_index()
+    get_gazetteer()
+    get_typo_index()
+    get_driver_registry().refresh_in_background()
+    get_nlp()
+    preload_lemmas(pattern for intent in load_intents()['intents'] for pattern in intent['patterns'])
 
 #### ENTITY EXTRACTION ###
 
 def extract_race(text):
-    text_lower = text.lower()
-    sorted_races = sorted(F1_RACES.keys(), key=len, reverse=True)
-    for search_term in sorted_races:
-        if search_term in text_lower:
-            return F1_RACES[search_term]
-    return None
+    return get_gazetteer().find(text)['race']
+
+def extract_typo(text, label):
+    """Canonical name of a misspelled driver / team / race alias in text, or None"""
+    match = get_typo_index().find(text, (label,)).get(label)
+    return match[0] if match else None
 
 # combine race dictionary + spacy
-def extract_race_hybrid(text):
-    race = extract_race(text)
+def extract_race_hybrid(text, spacy_entities=None):
+    race = extract_race(text) or extract_typo(text, 'race')
     if race : return race
 
-    spacy_entities = extract_entities_spacy(text)
-    if spacy_entities['location'] :
-        return spacy_entities['location'][0]
-    return None
+    if spacy_entities is None:
+        spacy_entities = extract_entities_spacy(text)
+    return first_entity(spacy_entities, 'location')
 
 def extract_round(text):
     match = re.search(r'(?:round|race)\s*(\d+)', text.lower())
@@ -69,50 +182,37 @@ def extract_round(text):
 #  Extract driver function :Extracts driver name from text.
 
 def extract_driver(text):
-    
-    text_lower = text.lower()
-    sorted_drivers = sorted(F1_DRIVERS.keys(), key=len, reverse=True)
-    
-    for search_driver in sorted_drivers:
-        if search_driver in text_lower:
-            return F1_DRIVERS[search_driver]
-    
-    return None
+    return get_gazetteer().find(text)['driver']
 
 # compine the dictionary + spacy
-def extract_driver_hybrid(text):
+def extract_driver_hybrid(text, spacy_entities=None):
     """
     Hybrid approach:
     1. Try your dictionary first (fast, F1-specific)
-    2. If not found, use spaCy (slower, but catches more)
+    2. Then misspelled dictionary aliases ("verstapen", see typo_index.py)
+    3. If not found, use spaCy (slower, but catches more)
+
+    Pass spacy_entities to reuse a parse that was already done for this text.
     """
 
-    driver = extract_driver(text)
+    driver = extract_driver(text) or extract_typo(text, 'driver')
     if driver : return driver
-    spacy_entities = extract_entities_spacy(text)
-    if spacy_entities['person'] : return spacy_entities['person'][0]
-    return None
+    if spacy_entities is None:
+        spacy_entities = extract_entities_spacy(text)
+    return first_entity(spacy_entities, 'person')
 
 #  Extract Team Function :Extracts team name from text.
 def extract_team(text):
-    text_lower = text.lower()
-    sorted_teams = sorted(F1_TEAMS.keys(), key=len, reverse=True)
-    
-    for search_team in sorted_teams:
-        if search_team in text_lower:
-            return F1_TEAMS[search_team]
-    
-    return None
+    return get_gazetteer().find(text)['team']
 
 # combine extract team + spacy
-def extract_team_hybrid(text):
-    team = extract_team(text)
+def extract_team_hybrid(text, spacy_entities=None):
+    team = extract_team(text) or extract_typo(text, 'team')
     if team : return team
 
-    spacy_entities = extract_entities_spacy(text)
-    if spacy_entities['org'] : 
-        return spacy_entities['org'][0]
-    return None
+    if spacy_entities is None:
+        spacy_entities = extract_entities_spacy(text)
+    return first_entity(spacy_entities, 'org')
 # Extract year function : Extracts year from text (2000-2025)
 
 def extract_year(text):
@@ -129,179 +229,291 @@ def extract_year(text):
     
     return None
 
+def extract_years(text):
+    """Every distinct 4-digit year in text, in order, else [extract_year(text)] or []"""
+    years = list(dict.fromkeys(re.findall(r'\b(20[0-2][0-9])\b', text)))
+    if years:
+        return years
+    year = extract_year(text)
+    return [year] if year else []
+
+def extract_rounds(text):
+    return list(dict.fromkeys(re.findall(r'(?:round|race)\s*(\d+)', text.lower())))
+
 
 ### PEDICTION ###
 
 def predict(sentence):
     """Predict the intent of a given sentence"""
+    return predict_batch([sentence])[0]
+
+def predict_batch(sentences):
+    """
+    Predict the intents of many sentences with a single forward pass.
+
+    Returns:
+        list of (intent, confidence), in the same order as sentences
+    """
+    if not sentences:
+        return []
+
+    model, bag_of_words, classes = load_model()
+
     # Clean and prepare input
-    sentence_words = clean_text(sentence)
-    bag = [1 if word in sentence_words else 0 for word in words]
-   
-    input_tensor = torch.FloatTensor(bag).unsqueeze(0)  # Add batch dimension
-    
+    with METRICS.span("clean_text"):
+        bags = bag_of_words.transform([clean_text(s) for s in sentences])
+
     # Get prediction
-    with torch.no_grad():
-        output = model(input_tensor)
-        probabilities = F.softmax(output, dim=1)
-        predicted_class = torch.argmax(probabilities, dim=1).item()
-        confidence = probabilities[0][predicted_class].item()
-    
-    return classes[predicted_class], confidence
+    with METRICS.span("predict"):
+        probabilities = model.predict_proba(bags)
+    predicted_classes = probabilities.argmax(axis=1)
+    confidences = probabilities[np.arange(len(sentences)), predicted_classes]
+
+    return [(classes[predicted], confidence)
+            for predicted, confidence in zip(predicted_classes.tolist(), confidences.tolist())]
 
 # prediction with entities 
-def predict_with_entities(sentence):
+def fallback_intent(sentence):
+    """
+    Nearest-pattern intent for a sentence the model is unsure about.
+    Returns (intent, similarity), or (None, 0.0) without a close enough pattern.
+    """
+    pattern_index = load_pattern_index()
+    if pattern_index is None:
+        METRICS.inc("f1_fallback_total", result="no_index")
+        return None, 0.0
+    with METRICS.span("pattern_index"):
+        intent, similarity = pattern_index.classify(clean_text(sentence))
+    if similarity < FALLBACK_THRESHOLD:
+        METRICS.inc("f1_fallback_total", result="no_match")
+        return None, 0.0
+    METRICS.inc("f1_fallback_total", result="matched")
+    return intent, similarity
+
+# Gazetteer label -> spaCy label used when the gazetteer finds nothing
+SPACY_FALLBACK_LABELS = {"driver": "person", "team": "org", "race": "location"}
+
+def extract_entity_values(sentence, needed=ENTITY_NAMES):
+    """
+    Every distinct value of the entities in needed, in reading order, as
+    {name: [values]} ("compare Verstappen and Hamilton" has two drivers);
+    the other entities get [].
+    Gazetteer first (one pass for all dictionaries), then the typo index on
+    the words the gazetteer didn't match; spaCy parses the sentence at most
+    once, and only if both missed one of the needed lookups.
+    """
+    values = {name: [] for name in ENTITY_NAMES}
+    lookups = [name for name in SPACY_FALLBACK_LABELS if name in needed]
+    if lookups:
+        with METRICS.span("gazetteer"):
+            mentions = get_gazetteer().find_all(sentence)
+        # Misspelled aliases next (microseconds): "verstapen and hamilton" has two drivers
+        with METRICS.span("typo_index"):
+            typos = get_typo_index().find_all(sentence, lookups, skip=[(start, end) for _, _, start, end in mentions])
+        for label, _, _, _, _ in typos:
+            METRICS.inc("f1_typo_matches_total", label=label)
+        found = sorted([(start, label, name) for label, name, start, _ in mentions]
+                       + [(start, label, name) for label, name, start, _, _ in typos])
+        for _, label, name in found:
+            if label in lookups and name not in values[label]:
+                values[label].append(name)
+        # spaCy only for what is still missing
+        missing = [name for name in lookups if not values[name]]
+        if missing:
+            spacy_entities = extract_entities_spacy(sentence)
+            for name in missing:
+                values[name] = list(dict.fromkeys(spacy_entities[SPACY_FALLBACK_LABELS[name]]))
+
+    if 'year' in needed:
+        values['year'] = extract_years(sentence)
+    if 'round' in needed:
+        values['round'] = extract_rounds(sentence)
+    return values
+
+def first_values(values):
+    """{name: first value or None} of an extract_entity_values result"""
+    return {name: found[0] if found else None for name, found in values.items()}
+
+def extract_entities(sentence, needed=ENTITY_NAMES):
+    """First value of each entity in needed (see extract_entity_values); the others are None."""
+    return first_values(extract_entity_values(sentence, needed))
+
+def is_trusted(result):
+    """False when the prediction is too unsure to act on (a pattern-index match already passed FALLBACK_THRESHOLD)"""
+    return result['confidence'] >= CONFIDENCE_THRESHOLD or result.get('source') == "pattern_index"
+
+def predict_with_entities(sentence, needed=None):
+    """
+    Predicts the intent and extracts the entities its handler reads
+    (or those in needed); nothing is extracted for an untrusted prediction.
+    """
     intent , confidence = predict(sentence)
-    driver = extract_driver_hybrid(sentence)
-    team = extract_team_hybrid(sentence)
-    year = extract_year(sentence) 
-    race = extract_race_hybrid(sentence)
-    round = extract_round(sentence)
-    return {
-        "intent": intent,
-        "confidence": confidence,
-        "entities": {
-            "driver": driver,
-            "team": team,
-            "year": year,
-            "race" : race,
-            "round": round
-        }
-       }  
+    source = "model"
+    if confidence < CONFIDENCE_THRESHOLD:
+        fallback, similarity = fallback_intent(sentence)
+        if fallback:
+            intent, confidence, source = fallback, similarity, "pattern_index"
+
+    result = {"intent": intent, "confidence": confidence, "source": source}
+    METRICS.annotate(intent=intent, confidence=round(confidence, 4), source=source)
+    if needed is None:
+        needed = get_handler(intent).entities if is_trusted(result) else ()
+    result["entity_values"] = extract_entity_values(sentence, needed)
+    result["entities"] = first_values(result["entity_values"])
+    return result
+
+# Upper bound on the parts one message is split into (2 drivers x 3 years = 6)
+MAX_PARTS = 6
+
+def split_result(result):
+    """
+    One result per combination of the entities mentioned more than once
+    ("standings for 2021 and 2022" -> one result per year), each with those
+    entities set to one of the values; at most MAX_PARTS. A result with a
+    single value per entity is returned as is.
+    """
+    values = result.get('entity_values', {})
+    multiple = [name for name in ENTITY_NAMES if len(values.get(name, ())) > 1]
+    if not multiple:
+        return [result]
+    combinations = itertools.islice(itertools.product(*(values[name] for name in multiple)), MAX_PARTS)
+    return [dict(result, entities=dict(result['entities'], **dict(zip(multiple, combination))))
+            for combination in combinations]
 
 ###  Generate response function ###
 
-def generate_response(user_input):
+def plan_response(result):
     """
-    1.Predicts intent
-    2.Extracts entities
-    3.Calls appropriate API function
-    4.Returns formatted response
+    Decides how to answer a prediction from predict_with_entities.
+
+    Returns:
+        (reply, None) when no API call is needed, or
+        (None, (api function name, args, formatter)) where the function is looked up
+        in api_functions (or async_api) and the formatter turns its result into the reply
     """
-    result = predict_with_entities(user_input)
     intent = result['intent']
-    confidence = result['confidence']
     entities = result['entities']
     
     # If confidence is too low, return fallback
-    if confidence < 0.6:
-        return "I'm not sure I understood. Can you rephrase?"
-    
-    # Handle each intent with API calls
-    
-    if intent == "greeting":
-        return "Hello! How can I help you with Formula 1 today?"
-    
-    elif intent == "goodbye":
-        return "Goodbye! Enjoy the race weekend."
-    
-    elif intent == "thanks":
-        return "You're welcome!"
-    
-    elif intent == "next_race":
-        race_data = get_next_race()
-        if "error" in race_data:
-            return "Sorry, I couldn't fetch the next race information."
-        return f" Next Race: {race_data['race_name']}\n" \
-               f" Circuit: {race_data['circuit']}, {race_data['country']}\n" \
-               f" Date: {race_data['date']}\n" \
-               f" Time: {race_data['time']}"
-    
-    elif intent == "last_race":
-        race_data = get_last_race_results()
-        if "error" in race_data:
-            return "Sorry, I couldn't fetch the last race results."
-        
-        response = f" {race_data['race_name']} ({race_data['date']})\n"
-        response += f" {race_data['circuit']}\n\n"
-        response += " Podium:\n"
-        for driver in race_data['top_3']:
-            response += f"  {driver['position']}. {driver['driver']} ({driver['team']})\n"
-        return response
-    
-    elif intent == "driver_standings":
-        year = entities['year'] if entities['year'] else 'current'
-        standings_data = get_driver_standings(year)
-        if "error" in standings_data:
-            return "Sorry, I couldn't fetch the driver standings."
-        
-        response = f" {standings_data['season']} Driver Standings (Top 10):\n\n"
-        for driver in standings_data['standings']:
-            response += f"{driver['position']}. {driver['driver']} - {driver['points']} pts ({driver['wins']} wins)  Team: {driver['team']}\n"
-        return response
-    
-    elif intent == "constructor_standings":
-        year = entities['year'] if entities['year'] else 'current'
-        standings_data = get_constructor_standings(year)
-        if "error" in standings_data:
-            return "Sorry, I couldn't fetch the constructor standings."
-        
-        response = f" {standings_data['season']} Constructor Standings:\n\n"
-        for team in standings_data['standings']:
-            response += f"{team['position']}. {team['constructor']} - {team['points']} pts ({team['wins']} wins)\n"
-        return response
-    
-    elif intent == "driver_info":
-        driver_name = entities['driver']
-        if not driver_name:
-            return "Please specify which driver you'd like to know about."
-        
-        # Get API ID for driver
-        api_id = DRIVER_API_IDS.get(driver_name)
-        if not api_id:
-            return f"Sorry, I don't have detailed info for {driver_name} yet."
-        
-        driver_data = get_driver_info(api_id)
-        if "error" in driver_data:
-            return f"Sorry, I couldn't find information about {driver_name}."
-        
-        return f" {driver_data['full_name']}\n" \
-               f" Code: {driver_data['code']}\n" \
-               f" Number: {driver_data['number']}\n" \
-               f" Nationality: {driver_data['nationality']}\n" \
-               f" Born: {driver_data['birth_day']}\n" \
-               f" More info: {driver_data['url']}"
-    
-    elif intent == "race_schedule":
-        year = entities['year'] if entities['year'] else 'current'
-        schedule_data = get_race_schedule(year)
-        if "error" in schedule_data:
-            return "Sorry, I couldn't fetch the race schedule."
-        
-        response = f" {schedule_data['season']} F1 Calendar ({schedule_data['total_races']} races):\n\n"
-        for race in schedule_data['races'][:5]:  # Show first 5
-            response += f"Round {race['round']}: {race['race_name']} ({race['date']})\n"
-            response += f"   {race['circuit']}, {race['country']}\n"
-        response += f"\n... and {schedule_data['total_races'] - 5} more races!"
-        return response
+    if not is_trusted(result):
+        METRICS.inc("f1_low_confidence_total")
+        return "I'm not sure I understood. Can you rephrase?", None
     
-    elif intent =="race_winner":
-        year = entities['year'] if entities['year'] else '2024'
-        round_number = entities['round'] 
-        if not round_number and entities['race'] :
-            return f"Which round was {entities['race']}? Please specify the round number."
-        if not round_number:
-          return "Please specify which race"
-        race_data = get_race_winner(year , round_number)
-        if "error" in race_data: return "Sorry , couldn't find that race"
-        return f" race name :{race_data['race_name']} \n"\
-               f"winner : {race_data['winner']}\n"\
-               f"Team: {race_data['team']}\n"\
-               f"Date : {race_data['date']}"
+    # Hot intents (next/last race, current standings) are rendered ahead of time
+    hot_reply = HOT_RESPONSES.lookup(intent, entities)
+    if hot_reply:
+        METRICS.inc("f1_hot_responses_total", intent=intent)
+        return hot_reply, None
     
-    
-    else:
-        # Default response from intents.json
-        for intent_data in intents['intents']:
-            if intent_data['tag'] == intent:
-                return random.choice(intent_data['responses'])
-        
-        return "I'm not sure how to help with that."
+    # Handlers registered in handlers.py, else the intents.json responses
+    return get_handler(intent).plan(entities)
+
+def plan_responses(result):
+    """plan_response of every part of result (see split_result), in order"""
+    return [plan_response(part) for part in split_result(result)]
+
+# End-to-end budget of one message, in seconds: Ergast calls still running
+# after it are answered from the last known good data (F1_MESSAGE_BUDGET_MS)
+MESSAGE_BUDGET = float(os.environ.get("F1_MESSAGE_BUDGET_MS", 2000)) / 1000
+
+# API calls of one message run concurrently on this many threads
+MAX_PARALLEL_CALLS = 4
+_api_pool = None
+_api_pool_lock = threading.Lock()
+
+def _get_api_pool():
+    global _api_pool
+    if _api_pool is None:
+        with _api_pool_lock:
+            if _api_pool is None:
+                _api_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_CALLS, thread_name_prefix="api")
+    return _api_pool
+
+def _forget_api_pool():
+    # The pool's threads don't survive a fork (server.py workers build their own)
+    global _api_pool, _api_pool_lock
+    _api_pool, _api_pool_lock = None, threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_api_pool)
+
+def unique_calls(plans):
+    """
+    The distinct (api function name, args) of plans, in order: identical
+    calls (same function and arguments, so the same URL) are made once.
+    """
+    return list(dict.fromkeys((api_call[0], api_call[1]) for _, api_call in plans if api_call is not None))
+
+# Appended to replies built from the last known good data (see api_functions.fetch)
+STALE_NOTE = "\n(Live data is unavailable right now, this may be out of date.)"
+
+def format_result(formatter, result):
+    reply = formatter(result)
+    if isinstance(result, dict) and result.get('stale'):
+        reply += STALE_NOTE
+    return reply
+
+def merge_replies(plans, results):
+    """
+    Formats each plan's API result (results maps (function name, args) to it)
+    and joins the distinct replies into one, separated by blank lines.
+    """
+    with METRICS.span("format"):
+        replies = [reply if api_call is None else format_result(api_call[2], results[api_call[0], api_call[1]])
+                   for reply, api_call in plans]
+        return "\n\n".join(dict.fromkeys(replies))
+
+def run_api_calls(calls):
+    """
+    Results of the (function name, args) calls to api_functions as a dict.
+    Several calls run concurrently on the API thread pool, so a message waits
+    for its slowest call rather than for the sum of them.
+    """
+    if len(calls) <= 1:
+        return {(name, args): getattr(api_functions, name)(*args) for name, args in calls}
+    pool = _get_api_pool()
+    # Each call runs in a copy of this context, so its spans join the current message's trace
+    futures = {(name, args): pool.submit(contextvars.copy_context().run, getattr(api_functions, name), *args)
+               for name, args in calls}
+    return {call: future.result() for call, future in futures.items()}
+
+def generate_response(user_input):
+    """
+    1.Predicts intent
+    2.Extracts entities, splitting multi-part questions (see split_result)
+    3.Calls the needed API functions concurrently
+    4.Returns the formatted response, within MESSAGE_BUDGET
+    """
+    with METRICS.trace(), api_functions.deadline(MESSAGE_BUDGET):
+        plans = plan_responses(predict_with_entities(user_input))
+        with METRICS.span("api_calls"):
+            results = run_api_calls(unique_calls(plans))
+        return merge_replies(plans, results)
+
+async def generate_response_async(user_input):
+    """Same as generate_response, but gathers the async_api versions of the API calls."""
+    import asyncio
+    import async_api  # needs aiohttp, only loaded by async callers
+
+    with METRICS.trace(), api_functions.deadline(MESSAGE_BUDGET):
+        # The model, spaCy and SQLite block: they run on a worker thread so the
+        # event loop keeps serving other messages (to_thread copies the context,
+        # trace and deadline included)
+        plans = await asyncio.to_thread(lambda: plan_responses(predict_with_entities(user_input)))
+        calls = unique_calls(plans)
+        with METRICS.span("api_calls"):
+            results = await asyncio.gather(*(getattr(async_api, name)(*args) for name, args in calls))
+        return merge_replies(plans, dict(zip(calls, results)))
 
 
 ### MAIN CHATBOT ###
 
 def chat():
+    print("🏎️  F1 CHATBOT")
+    print("="*60)
+    print("\n📦 Loading model...")
+    warmup()
+    print("✅ Model loaded successfully!")
+    HOT_RESPONSES.start()
     print("\n" + "="*60)
     print("Chat started! Type 'quit' or 'exit' to stop.")
     print("="*60 + "\n")
@@ -0,0 +1,180 @@
+"""
+Local registry of every driver in Ergast's /drivers list (about 850).
+
+Maps a driver as users write it (full name, family name, code, given name
+or permanent number) to the Ergast driverId that get_driver_info needs, with
+a dict lookup and no API call. The list is downloaded in bulk (paged, see
+snapshot.fetch_all_pages), saved to driver_registry.json and refreshed in a
+background thread once it is older than REFRESH_INTERVAL. Processes sharing
+the file (server.py's master and its forked workers) reload it when another
+one saves a newer list.
+
+Several drivers can share a key ("schumacher", "44" has been used before
+Hamilton). Keys are resolved by tier: full name, then family name, code,
+given name and number; within a tier drivers with a permanent number (the
+current era) win, then the youngest.
+"""
+import json
+import os
+import threading
+import time
+
+from utils import DRIVER_API_IDS, normalize_name
+
+DEFAULT_REGISTRY_PATH = os.environ.get(
+    "F1_DRIVER_REGISTRY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "driver_registry.json"),
+)
+
+# Seconds before the saved list is downloaded again (new drivers are rare)
+REFRESH_INTERVAL = 7 * 24 * 60 * 60
+# Seconds before a failed download is retried
+RETRY_INTERVAL = 10 * 60
+# Seconds between checks for a list saved by another process
+RELOAD_CHECK_INTERVAL = 5
+
+# Fields kept per driver, in the order they are saved
+FIELDS = ("driverId", "givenName", "familyName", "code", "permanentNumber", "dateOfBirth")
+
+
+def build_index(drivers):
+    """{normalized key: driverId} for a list of driver dicts with FIELDS"""
+    # Current era first, then youngest: setdefault keeps the first driver per key
+    ordered = sorted(drivers, key=lambda d: (bool(d.get('permanentNumber')), d.get('dateOfBirth') or ""),
+                     reverse=True)
+    tiers = [
+        lambda d: f"{d['givenName']} {d['familyName']}",
+        lambda d: d['familyName'],
+        lambda d: d.get('code'),
+        lambda d: d['givenName'],
+        lambda d: d.get('permanentNumber'),
+    ]
+    index = {}
+    for key_of in tiers:
+        for driver in ordered:
+            key = key_of(driver)
+            if key:
+                index.setdefault(normalize_name(key), driver['driverId'])
+    return index
+
+
+class DriverRegistry:
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, refresh_interval=REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.fetched_at = None
+        self.drivers = []
+        # Until the list is loaded, the built-in drivers still resolve
+        self.index = {normalize_name(name): driver_id for name, driver_id in DRIVER_API_IDS.items()}
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._last_attempt = None
+        self._loaded_mtime = None  # mtime of the file the list was loaded from or saved to
+        self._checked_at = 0.0
+        self.load()
+
+    def __len__(self):
+        return len(self.drivers)
+
+    def load(self):
+        """Reads the saved list, if there is a readable one (the current list is kept otherwise)"""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        self._loaded_mtime = mtime  # a bad file isn't read again until it changes
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            drivers = [dict(zip(FIELDS, row)) for row in saved['drivers']]
+            fetched_at = float(saved['fetched_at'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not read the driver registry {self.path}: {e}")
+            return False
+        self._install(drivers, fetched_at)
+        return True
+
+    def save(self):
+        # Written to a temporary file and renamed, like numpy_network.export_numpy;
+        # one per process, since server workers can save at the same time
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at,
+                       "drivers": [[driver.get(field) for field in FIELDS] for driver in self.drivers]}, f)
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = os.stat(self.path).st_mtime
+
+    def reload_if_changed(self):
+        """Loads the file again if another process saved it since (checked every RELOAD_CHECK_INTERVAL)"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            self.load()
+
+    def _install(self, drivers, fetched_at):
+        index = build_index(drivers)
+        index.update((normalize_name(name), driver_id) for name, driver_id in DRIVER_API_IDS.items())
+        # Readers only ever see a complete index
+        self.drivers, self.index, self.fetched_at = drivers, index, fetched_at
+
+    def refresh(self):
+        """Downloads the whole /drivers list, then swaps it in and saves it. Returns the number of drivers."""
+        from snapshot import fetch_all_pages
+
+        drivers = fetch_all_pages("drivers", 'DriverTable', 'Drivers', page_size=1000)
+        if not drivers:
+            raise RuntimeError("Could not download the driver list")
+        self._install([{field: driver.get(field) for field in FIELDS} for driver in drivers], time.time())
+        if self.path:
+            self.save()
+        return len(drivers)
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Driver registry refresh failed: {e}")
+
+    def refresh_in_background(self):
+        """Starts refresh() on a daemon thread if the list is missing or old (at most one at a time)"""
+        now = time.monotonic()
+        if self.fetched_at is not None and time.time() - self.fetched_at < self.refresh_interval:
+            return
+        with self._lock:
+            # A thread started before a fork is not alive in the child
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if self._last_attempt is not None and now - self._last_attempt < RETRY_INTERVAL:
+                return
+            self._last_attempt = now
+            self._refresh_thread = threading.Thread(target=self._refresh_quietly, name="driver-registry",
+                                                    daemon=True)
+            self._refresh_thread.start()
+
+    def driver_id(self, name):
+        """Ergast driverId for a driver name, family name, code or number, or None"""
+        self.reload_if_changed()
+        self.refresh_in_background()
+        return self.index.get(normalize_name(name))
+
+
+# Built on first use, shared by the driver_info handler
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_driver_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = DriverRegistry()
+    return _registry
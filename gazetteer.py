@@ -0,0 +1,82 @@
+"""
+Gazetteer index over the F1 dictionaries in utils.py.
+Compiles every alias once into a spaCy PhraseMatcher so all driver, team and
+race mentions are found in a single token-level pass over the message.
+"""
+import threading
+from utils import F1_DRIVERS, F1_TEAMS, F1_RACES
+
+
+class Gazetteer:
+    """
+    Maps alias dictionaries ({alias: canonical name}) to labelled mentions.
+
+    Matching is done on lowercased tokens, so aliases only match whole words
+    ("max" does not match inside "maximum"), and overlapping matches are
+    resolved in favour of the longest one ("max verstappen" beats "max").
+    """
+
+    def __init__(self, dictionaries):
+        # Imported here so that importing this module doesn't import spaCy
+        import spacy
+        from spacy.matcher import PhraseMatcher
+        from spacy.util import filter_spans
+        self._filter_spans = filter_spans
+
+        # Tokenizer only: no statistical model is needed to match phrases
+        self.nlp = spacy.blank("en")
+        self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        self.labels = list(dictionaries)
+        self.canonical = {}  # (label, normalized alias) -> canonical name
+
+        for label, entries in dictionaries.items():
+            patterns = []
+            for alias, name in entries.items():
+                doc = self.nlp.make_doc(alias)
+                self.canonical[(label, self._normalize(doc))] = name
+                patterns.append(doc)
+            self.matcher.add(label, patterns)
+
+    @staticmethod
+    def _normalize(tokens):
+        return " ".join(token.lower_ for token in tokens)
+
+    def find_all(self, text):
+        """
+        Returns every mention in text as a list of
+        (label, canonical name, start char, end char), in reading order.
+        """
+        doc = self.nlp.make_doc(text)
+        spans = self._filter_spans(self.matcher(doc, as_spans=True))
+        return [
+            (span.label_, self.canonical[(span.label_, self._normalize(span))],
+             span.start_char, span.end_char)
+            for span in spans
+        ]
+
+    def find(self, text):
+        """Returns {label: first canonical name found or None} for every label."""
+        found = dict.fromkeys(self.labels)
+        for label, name, _, _ in self.find_all(text):
+            if found[label] is None:
+                found[label] = name
+        return found
+
+
+# Built once on first use, shared by every extractor
+_gazetteer = None
+_build_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The shared gazetteer over F1_DRIVERS, F1_TEAMS and F1_RACES."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _build_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer({
+                    "driver": F1_DRIVERS,
+                    "team": F1_TEAMS,
+                    "race": F1_RACES,
+                })
+    return _gazetteer
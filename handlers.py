@@ -0,0 +1,115 @@
+"""
+Intent handlers.
+
+Each intent with its own logic registers a Handler here, keyed by its tag.
+A handler declares the entities it reads, so chatbot.predict_with_entities
+only runs those extractors (the gazetteer and spaCy are skipped entirely for
+intents like greeting or next_race). Intents without a handler are answered
+with their intents.json responses (see chatbot.get_handler).
+
+Adding an intent is one registration:
+
+    @handler("race_time", "race")
+    def plan_race_time(entities):
+        ...
+"""
+from functools import partial
+
+from driver_registry import get_driver_registry
+from responses import (
+    format_next_race, format_last_race, format_driver_standings, format_constructor_standings,
+    format_driver_info, format_race_schedule, format_race_winner, format_race_winner_by_name
+)
+
+# Every entity chatbot.extract_entities knows, in the order of its result dict
+ENTITY_NAMES = ("driver", "team", "year", "race", "round")
+
+
+class Handler:
+    """
+    plan(entities) -> (reply, None) when no API call is needed, or
+    (None, (api function name, args, formatter)), see chatbot.plan_response.
+    entities is the set of entity names plan reads; the others are None.
+    """
+
+    def __init__(self, plan, entities=()):
+        unknown = set(entities) - set(ENTITY_NAMES)
+        if unknown:
+            raise ValueError(f"unknown entities: {', '.join(sorted(unknown))}")
+        self.plan = plan
+        self.entities = frozenset(entities)
+
+
+# tag -> Handler
+HANDLERS = {}
+
+
+def handler(tag, *entities):
+    """Decorator registering plan(entities) as the handler of intent tag."""
+    def register(plan):
+        HANDLERS[tag] = Handler(plan, entities)
+        return plan
+    return register
+
+
+def register_reply(tag, reply):
+    """Registers a handler answering tag with a fixed reply."""
+    HANDLERS[tag] = Handler(lambda entities: (reply, None))
+
+
+def register_api_call(tag, function_name, formatter):
+    """Registers a handler answering tag with an argument-less API call."""
+    HANDLERS[tag] = Handler(lambda entities: (None, (function_name, (), formatter)))
+
+
+register_reply("greeting", "Hello! How can I help you with Formula 1 today?")
+register_reply("goodbye", "Goodbye! Enjoy the race weekend.")
+register_reply("thanks", "You're welcome!")
+
+register_api_call("next_race", "get_next_race", format_next_race)
+register_api_call("last_race", "get_last_race_results", format_last_race)
+
+
+@handler("driver_standings", "year")
+def plan_driver_standings(entities):
+    year = entities['year'] if entities['year'] else 'current'
+    return None, ("get_driver_standings", (year,), format_driver_standings)
+
+
+@handler("constructor_standings", "year")
+def plan_constructor_standings(entities):
+    year = entities['year'] if entities['year'] else 'current'
+    return None, ("get_constructor_standings", (year,), format_constructor_standings)
+
+
+@handler("driver_info", "driver")
+def plan_driver_info(entities):
+    driver_name = entities['driver']
+    if not driver_name:
+        return "Please specify which driver you'd like to know about.", None
+
+    # Ergast driverId from the local registry of every driver (no API call)
+    api_id = get_driver_registry().driver_id(driver_name)
+    if not api_id:
+        return f"Sorry, I don't have detailed info for {driver_name} yet.", None
+
+    return None, ("get_driver_info", (api_id,), partial(format_driver_info, driver_name=driver_name))
+
+
+@handler("race_schedule", "year")
+def plan_race_schedule(entities):
+    year = entities['year'] if entities['year'] else 'current'
+    return None, ("get_race_schedule", (year,), format_race_schedule)
+
+
+@handler("race_winner", "year", "round", "race")
+def plan_race_winner(entities):
+    year = entities['year'] if entities['year'] else '2024'
+    round_number = entities['round']
+    if not round_number and entities['race']:
+        # Race name -> round from the season's schedule, in the API stage (see round_index.py)
+        return None, ("get_race_winner_by_name", (year, entities['race']),
+                      partial(format_race_winner_by_name, race=entities['race']))
+    if not round_number:
+        return "Please specify which race", None
+    return None, ("get_race_winner", (year, round_number), format_race_winner)
@@ -0,0 +1,188 @@
+"""
+Precomputed replies for hot intents.
+next_race, last_race and the current standings give every user the same
+answer until the data changes, so a background thread renders them ahead of
+time and the request path only reads a dict. Refreshes are frequent over a
+race weekend and rare in between.
+
+Processes that share a file (server.py's forked workers) refresh in only one
+of them: it saves the replies to the file and the others load them from it.
+"""
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import api_functions
+from responses import format_next_race, format_last_race, format_driver_standings, format_constructor_standings
+
+RACE_WEEKEND_INTERVAL = 5 * 60    # seconds between refreshes from Friday until the day after the race
+QUIET_INTERVAL = 6 * 60 * 60      # seconds between refreshes the rest of the time
+# A reply is dropped once this many refresh intervals passed without a successful refresh
+MAX_AGE_INTERVALS = 3
+# Seconds between checks for replies saved by another process
+RELOAD_CHECK_INTERVAL = 5
+
+# intent -> (api function name, formatter); standings are only hot without a year
+HOT_INTENTS = {
+    "next_race": ("get_next_race", format_next_race),
+    "last_race": ("get_last_race_results", format_last_race),
+    "driver_standings": ("get_driver_standings", format_driver_standings),
+    "constructor_standings": ("get_constructor_standings", format_constructor_standings),
+}
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HotResponseCache:
+    """
+    Holds the rendered reply of each hot intent, refreshed by a daemon thread
+    started with start(), or loaded from the file of another process's cache
+    with follow(). Until the first refresh (or if neither is called) lookup()
+    returns None and callers go to the API as usual.
+    """
+
+    def __init__(self, hot_intents=HOT_INTENTS, race_weekend_interval=RACE_WEEKEND_INTERVAL,
+                 quiet_interval=QUIET_INTERVAL):
+        self.hot_intents = hot_intents
+        self.race_weekend_interval = race_weekend_interval
+        self.quiet_interval = quiet_interval
+        self.responses = {}
+        self.expires_at = {}  # intent -> time.monotonic() after which its reply is no longer served
+        self.race_dates = {}  # "next_race" / "last_race" -> date, from the latest refresh
+        self.refreshed_at = None
+        self.path = None  # file the replies are saved to (start) or loaded from (follow)
+        self._following = False
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def lookup(self, intent, entities):
+        """The precomputed reply for this intent, or None if it isn't hot for these entities."""
+        if intent not in self.hot_intents:
+            return None
+        if entities.get('year') not in (None, 'current'):
+            return None
+        if self._following:
+            self.reload_if_changed()
+        if time.monotonic() > self.expires_at.get(intent, 0):
+            return None
+        return self.responses.get(intent)
+
+    def refresh(self):
+        """
+        Re-renders every hot intent. A failed fetch (or stale data, see
+        api_functions.serve_stale) keeps the previous reply, until it is
+        MAX_AGE_INTERVALS refresh intervals old.
+        """
+        refreshed = []
+        for intent, (function_name, formatter) in self.hot_intents.items():
+            data = getattr(api_functions, function_name)()
+            if "error" in data or data.get('stale'):
+                continue
+            self.responses[intent] = formatter(data)
+            refreshed.append(intent)
+            if intent in ("next_race", "last_race"):
+                self.race_dates[intent] = _parse_date(data.get('date'))
+        # After the race dates, which set the interval
+        expires_at = time.monotonic() + MAX_AGE_INTERVALS * self.next_interval()
+        for intent in refreshed:
+            self.expires_at[intent] = expires_at
+        self.refreshed_at = datetime.now()
+        if self.path:
+            self.save()
+
+    def save(self):
+        # Expiry as wall-clock time: time.monotonic() isn't comparable between processes
+        now, wall_now = time.monotonic(), time.time()
+        replies = {intent: [reply, wall_now + self.expires_at.get(intent, 0) - now]
+                   for intent, reply in self.responses.items()}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(replies, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Reads the replies saved by the refreshing process (the current ones are kept if it can't)"""
+        try:
+            self._loaded_mtime = os.stat(self.path).st_mtime
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            now, wall_now = time.monotonic(), time.time()
+            responses = {intent: reply for intent, (reply, _) in saved.items()}
+            expires_at = {intent: now + wall_expires_at - wall_now
+                          for intent, (_, wall_expires_at) in saved.items()}
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Could not read the hot responses {self.path}: {e}")
+            return False
+        self.responses, self.expires_at = responses, expires_at
+        return True
+
+    def reload_if_changed(self):
+        """Loads the file again if it was saved since (checked every RELOAD_CHECK_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            self.load()
+
+    def next_interval(self, today=None):
+        """Seconds until the next refresh, based on the race calendar."""
+        today = today or date.today()
+        next_race = self.race_dates.get("next_race")
+        last_race = self.race_dates.get("last_race")
+
+        if next_race and next_race - timedelta(days=2) <= today <= next_race:
+            return self.race_weekend_interval
+        if last_race and last_race <= today <= last_race + timedelta(days=1):
+            return self.race_weekend_interval
+
+        # Don't sleep through the start of the next race weekend
+        if next_race:
+            weekend_start = datetime.combine(next_race - timedelta(days=2), datetime.min.time())
+            until_weekend = (weekend_start - datetime.now()).total_seconds()
+            if until_weekend > 0:
+                return min(self.quiet_interval, until_weekend)
+        return self.quiet_interval
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Hot response refresh failed: {e}")
+            self._stop.wait(self.next_interval())
+
+    def start(self, path=None):
+        """Refreshes in a background thread; with a path, every refresh is also saved there."""
+        self.path, self._following = path, False
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hot-responses", daemon=True)
+            self._thread.start()
+
+    def follow(self, path):
+        """Serves the replies another process's start(path) saves, instead of refreshing here."""
+        self.path, self._following = path, True
+        self._checked_at = 0.0
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# Shared instance used by chatbot.plan_response
+HOT_RESPONSES = HotResponseCache()
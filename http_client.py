@@ -0,0 +1,282 @@
+"""
+Shared HTTP session for the Ergast API.
+Pools keep-alive connections, retries idempotent GETs with jittered
+exponential backoff on 429/5xx, and rate-limits on the client side so we
+stay inside Ergast's quotas (4 requests/second, 200/hour).
+"""
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    Closed: every request goes through. After `threshold` consecutive
+    failures it opens and allow() returns False for `cooldown` seconds;
+    then a single trial request is let through (half-open). Its success
+    closes the breaker, its failure opens it for another cooldown. A trial
+    that never reports back is replaced by a new one after a cooldown.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def _trial_pending(self, now):
+        return self._trial and now - self._trial_started < self.cooldown
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            now = time.monotonic()
+            if self._trial_pending(now) or now - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._trial_pending(now) or now - self.opened_at < self.cooldown:
+                return False
+            self._trial = True
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class SingleFlight:
+    """
+    Concurrent do(key, fn) calls with the same key share one fn() call:
+    the first caller runs it, the others wait and get the same result (or
+    exception). Nothing is remembered once the call returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> (done event, [result, exception])
+
+    def do(self, key, fn, *args):
+        """Returns (result, shared) where shared is True if another caller ran fn"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (threading.Event(), [None, None])
+        done, outcome = call
+
+        if not leader:
+            done.wait()
+            if outcome[1] is not None:
+                raise outcome[1]
+            return outcome[0], True
+
+        try:
+            outcome[0] = fn(*args)
+        except BaseException as e:
+            outcome[1] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            done.set()
+        return outcome[0], False
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """Raised instead of waiting longer than allowed for a rate-limit slot."""
+
+
+class RateLimiter:
+    """Sliding-window limiter: at most `limit` acquisitions per `period` seconds."""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """
+        Records a call if one is allowed now: (0, token for release()),
+        else (seconds to wait, None).
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0] >= self.period:
+                self._calls.popleft()
+            if len(self._calls) < self.limit:
+                self._calls.append(now)
+                return 0, now
+            return self.period - (now - self._calls[0]), None
+
+    def try_acquire(self):
+        """Records a call if one is allowed now and returns 0, else returns the seconds to wait."""
+        return self.take()[0]
+
+    def release(self, token):
+        """Gives back a call recorded by take() or acquire() that was never made."""
+        with self._lock:
+            try:
+                self._calls.remove(token)
+            except ValueError:
+                pass  # already out of the window
+
+    def refuse(self, wait):
+        """The RateLimited error for a call that would have to wait `wait` seconds"""
+        return RateLimited(f"Rate limit of {self.limit} calls per {self.period:g} s reached, "
+                           f"next call allowed in {wait:.1f} s")
+
+    def acquire(self, max_wait=None):
+        """
+        Blocks until a call is allowed, then records it and returns its
+        token. Raises RateLimited right away when that is more than max_wait
+        seconds off (the hourly window can be an hour away).
+        """
+        give_up_at = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            wait, token = self.take()
+            if token is not None:
+                return token
+            if give_up_at is not None and time.monotonic() + wait > give_up_at:
+                raise self.refuse(wait)
+            time.sleep(wait)
+
+
+def acquire_all(limiters, max_wait=None):
+    """
+    acquire() on every limiter, or on none: when one raises, the calls
+    already recorded by the others are given back, so a call refused by the
+    hourly window doesn't use up a per-second slot.
+    """
+    taken = []
+    try:
+        for limiter in limiters:
+            taken.append((limiter, limiter.acquire(max_wait)))
+    except BaseException:
+        for limiter, token in taken:
+            limiter.release(token)
+        raise
+
+
+class CallTiming:
+    """Timing of one get() call, retries and rate-limit waits included."""
+
+    def __init__(self, url, status, attempts, seconds, waited):
+        self.url = url
+        self.status = status        # HTTP status, or None if every attempt failed
+        self.attempts = attempts
+        self.seconds = seconds      # wall time of the whole call
+        self.waited = waited        # part of it spent in the rate limiter and backoff
+
+    def __repr__(self):
+        return (f"CallTiming({self.url!r}, status={self.status}, attempts={self.attempts}, "
+                f"seconds={self.seconds:.3f}, waited={self.waited:.3f})")
+
+
+class ErgastSession:
+    """
+    requests.Session wrapper used by api_functions.get_json_response.
+
+    Args:
+        pool_size: keep-alive connections kept per host
+        max_retries: extra attempts after the first one fails with a connection error or 429/5xx
+        backoff: base delay in seconds; attempt n sleeps uniform(0, backoff * 2**n), capped at max_backoff
+        timeout: per-attempt timeout in seconds
+        rate_limits: list of (limit, period) windows applied before every attempt
+        max_wait: longest wait in seconds for a rate-limit slot before get() raises RateLimited
+    """
+
+    def __init__(self, pool_size=10, max_retries=3, backoff=0.5, max_backoff=8.0, timeout=10,
+                 rate_limits=((4, 1.0), (200, 3600.0)), max_wait=30.0, history=256):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.rate_limiters = [RateLimiter(limit, period) for limit, period in rate_limits]
+        self.max_wait = max_wait
+        self.timings = deque(maxlen=history)  # most recent CallTiming records
+
+    def _backoff_delay(self, attempt, response=None):
+        # Honour Retry-After (in seconds) when the server sends one
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url, headers=None, max_wait=None):
+        """
+        GETs url with retries. Returns the final requests.Response (which may
+        still be an error status) or raises the last RequestException.
+        max_wait (e.g. the caller's remaining budget) can only shorten the
+        session's own max_wait.
+        """
+        if max_wait is None or (self.max_wait is not None and self.max_wait < max_wait):
+            max_wait = self.max_wait
+        start = time.perf_counter()
+        waited = 0.0
+        response = None
+        attempt = 0
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                acquire_all(self.rate_limiters, max_wait)
+                waited += time.perf_counter() - wait_start
+
+                try:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt >= self.max_retries:
+                        raise
+                    response = None
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        return response
+
+                delay = self._backoff_delay(attempt, response)
+                time.sleep(delay)
+                waited += delay
+                attempt += 1
+        finally:
+            self.timings.append(CallTiming(
+                url, response.status_code if response is not None else None,
+                attempt + 1, time.perf_counter() - start, waited,
+            ))
+
+    @property
+    def last_timing(self):
+        return self.timings[-1] if self.timings else None
@@ -0,0 +1,73 @@
+"""
+Load test for server.py.
+Usage: python loadtest.py [--url http://127.0.0.1:8000/chat] [--concurrency 32] [--requests 2000]
+
+Sends the benchmark sample queries from concurrent clients and reports
+requests/sec and latency percentiles.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmark import SAMPLE_QUERIES, report
+
+
+def post_chat(url, message, timeout):
+    body = json.dumps({"message": message}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["reply"]
+
+
+def run(url, concurrency, total, timeout=30):
+    """Returns (latencies in ms of the successful requests, error count, wall time in seconds)."""
+    latencies = []
+    errors = []
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                post_chat(url, SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)], timeout)
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                with lock:
+                    errors.append(e)
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the chatbot HTTP server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="total requests")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    args = parser.parse_args()
+
+    run(args.url, min(args.concurrency, args.warmup), args.warmup)
+    latencies, errors, seconds = run(args.url, args.concurrency, args.requests)
+
+    print(f"{args.requests} requests, {args.concurrency} clients, {errors} errors")
+    print(f"{'throughput':<40} {len(latencies) / seconds:10.1f} requests/sec")
+    if latencies:
+        report("latency", latencies)
+        print(f"{'max':<40} {max(latencies):8.3f} ms")
@@ -0,0 +1,243 @@
+"""
+Timing spans and counters for the message pipeline.
+
+    with METRICS.trace():                 # one message
+        with METRICS.span("predict"):     # one stage of it
+            ...
+        METRICS.inc("f1_fallback_total", result="matched")
+
+Spans feed the f1_stage_seconds histogram (labelled by stage) and are also
+collected per message: with F1_METRICS_LOG set (a file path, or "-" for
+stderr) every message is written as one JSON line with its spans.
+METRICS.render_prometheus() returns everything in the Prometheus text
+format (server.py serves it on GET /metrics).
+
+Slow messages: with F1_PROFILE_SLOW_MS set, a sampling profiler follows
+each message and, when it takes longer than that, the most frequent stacks
+are passed to METRICS.on_slow_request (printed as JSON by default).
+"""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the histogram buckets, +Inf is implied
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Spans of the message being handled in this thread or asyncio task, or None
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds from a daemon
+    thread; stacks are counted as "outer;...;inner" frame lists.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self.samples[";".join(f"{os.path.basename(f.filename)}:{f.name}" for f in stack)] += 1
+
+    def top(self, n=5):
+        """The n most frequent stacks as [(stack, samples)]"""
+        return self.samples.most_common(n)
+
+
+def print_slow_request(record, stacks):
+    """Default METRICS.on_slow_request: one JSON line on stderr"""
+    print(json.dumps(dict(record, slow=True, stacks=stacks)), file=sys.stderr)
+
+
+class Metrics:
+    """Thread-safe counters and histograms, exported with snapshot() or render_prometheus()."""
+
+    def __init__(self, buckets=BUCKETS, log_path=None, profile_slow_ms=None):
+        self.buckets = buckets
+        self.log_path = log_path
+        self.profile_slow_ms = profile_slow_ms
+        self.on_slow_request = print_slow_request
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, label key) -> value
+        self._histograms = {}  # (name, label key) -> [count per bucket + Inf, sum]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        bucket = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+
+    @contextmanager
+    def timed(self, name, span_name, **labels):
+        """Observes the duration of the block in histogram name, and adds it to the current trace as span_name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(name, seconds, **labels)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace["spans"].append((span_name, round(seconds * 1000, 3)))
+
+    def span(self, stage):
+        """Times one pipeline stage (f1_stage_seconds{stage=...})"""
+        return self.timed("f1_stage_seconds", stage, stage=stage)
+
+    def annotate(self, **fields):
+        """Adds fields (intent, source, ...) to the JSON record of the current message"""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.update(fields)
+
+    @contextmanager
+    def trace(self, name="message"):
+        """
+        Times a whole message (f1_message_seconds) and collects the spans
+        of the stages run inside the block in this thread or asyncio task.
+        """
+        record = {"trace": name, "spans": []}
+        token = _current_trace.set(record)
+        profiler = None
+        if self.profile_slow_ms is not None:
+            profiler = SamplingProfiler(threading.get_ident()).start()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            _current_trace.reset(token)
+            if profiler is not None:
+                profiler.stop()
+            self.observe("f1_message_seconds", seconds, trace=name)
+            record["ms"] = round(seconds * 1000, 3)
+            self._write_log(record)
+            if profiler is not None and seconds * 1000 >= self.profile_slow_ms:
+                self.inc("f1_slow_messages_total", trace=name)
+                self.on_slow_request(record, profiler.top())
+
+    def _write_log(self, record):
+        if not self.log_path:
+            return
+        line = json.dumps(dict(record, ts=time.time(), pid=os.getpid()))
+        if self.log_path == "-":
+            print(line, file=sys.stderr)
+        else:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def snapshot(self):
+        """All counters and histograms as a JSON-serializable dict (see merge_snapshots)"""
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, dict(labels), list(counts), total]
+                               for (name, labels), (counts, total) in self._histograms.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def dump(self, path):
+        """Writes snapshot() to path (temporary file + rename, so readers never see half a file)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def render_prometheus(self, snapshot=None):
+        """snapshot (default: this process's) in the Prometheus text exposition format"""
+        return render_prometheus(snapshot or self.snapshot())
+
+
+def merge_snapshots(snapshots):
+    """Sums the counters and histograms of several snapshots (one per server worker)"""
+    merged = Metrics(buckets=tuple(snapshots[0]["buckets"]) if snapshots else BUCKETS)
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            merged.inc(name, value, **labels)
+        for name, labels, counts, total in snapshot["histograms"]:
+            key = (name, _label_key(labels))
+            histogram = merged._histograms.setdefault(key, [[0] * len(counts), 0.0])
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+            histogram[1] += total
+    return merged.snapshot()
+
+
+def render_prometheus(snapshot):
+    lines = []
+    counters = sorted(snapshot["counters"], key=lambda c: (c[0], _label_key(c[1])))
+    for i, (name, labels, value) in enumerate(counters):
+        if i == 0 or counters[i - 1][0] != name:
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(_label_key(labels))} {value}")
+
+    bounds = [repr(float(bound)) for bound in snapshot["buckets"]] + ["+Inf"]
+    histograms = sorted(snapshot["histograms"], key=lambda h: (h[0], _label_key(h[1])))
+    for i, (name, labels, counts, total) in enumerate(histograms):
+        if i == 0 or histograms[i - 1][0] != name:
+            lines.append(f"# TYPE {name} histogram")
+        key = _label_key(labels)
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(key)} {total}")
+        lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _profile_slow_ms():
+    value = os.environ.get("F1_PROFILE_SLOW_MS")
+    return float(value) if value else None
+
+
+# Shared by the whole pipeline
+METRICS = Metrics(log_path=os.environ.get("F1_METRICS_LOG"), profile_slow_ms=_profile_slow_ms())
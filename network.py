@@ -0,0 +1,31 @@
+"""
+PyTorch model of the intent classifier, used for training and by the torch
+inference path. Serving can use numpy_network.py instead, which needs no torch.
+"""
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+# Neural network ( input , 2 hidden layers , output layer )
+class Neural_Network(nn.Module):
+    def __init__(self, input_size, output_size):
+        super(Neural_Network, self).__init__()
+        self.fc1 = nn.Linear(input_size, 128)
+        self.fc2 = nn.Linear(128, 64)
+        self.fc3 = nn.Linear(64, output_size)
+        self.relu = nn.ReLU()
+        self.dropout = nn.Dropout(0.5)
+
+    def forward(self, x):
+        x = F.relu(self.fc1(x))   
+        x = self.dropout(x)
+        x = F.relu(self.fc2(x))   
+        x = self.dropout(x)
+        x = self.fc3(x)
+        return x  
+
+    def predict_proba(self, bags):
+        """Intent probabilities for a float32 numpy bag-of-words matrix, as a numpy array"""
+        with torch.no_grad():
+            return F.softmax(self(torch.from_numpy(bags)), dim=1).numpy()
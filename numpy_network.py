@@ -0,0 +1,134 @@
+"""
+NumPy-only inference for the intent classifier.
+
+train.py saves the weights of Neural_Network together with the vocabulary
+and classes to model.npz. Loading and running it needs no torch import,
+which keeps server workers small and quick to start.
+
+Export an existing model.pth without retraining, optionally with int8 weights:
+    python numpy_network.py model.pth model.npz
+    python numpy_network.py model.pth model_int8.npz --int8
+"""
+import os
+import numpy as np
+from utils import BagOfWords
+
+LAYERS = ("fc1", "fc2", "fc3")
+
+
+class Linear:
+    def __init__(self, weight, bias):
+        # Stored transposed as (in, out) so a batch is a plain x @ weight
+        self.weight = np.ascontiguousarray(weight.T, dtype=np.float32)
+        self.bias = bias.astype(np.float32)
+
+    def __call__(self, x):
+        return x @ self.weight + self.bias
+
+
+class Int8Linear:
+    """
+    Linear layer with int8 weights and one float scale per output unit
+    (symmetric: weight ~= quantized * scale), a quarter of the fp32 size.
+    Only the weight rows of inputs that are non-zero somewhere in the batch
+    are read and converted, which for a bag of words is a handful of rows.
+    """
+
+    def __init__(self, quantized, scale, bias):
+        self.weight = np.ascontiguousarray(quantized.T)  # (in, out) int8
+        self.scale = scale.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+
+    def __call__(self, x):
+        active = np.flatnonzero(x.any(axis=0))
+        return (x[:, active] @ self.weight[active].astype(np.float32)) * self.scale + self.bias
+
+
+def quantize_int8(weight):
+    """Per-output-unit symmetric int8 quantization of an (out, in) weight: (quantized, scale)"""
+    scale = np.abs(weight).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.clip(np.rint(weight / scale[:, None]), -127, 127).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+class NumpyNetwork:
+    """
+    Inference-only copy of Neural_Network: Linear + ReLU, Linear + ReLU, Linear.
+    Dropout is the identity at inference time, so it is left out.
+    """
+
+    def __init__(self, layers):
+        # Linear or Int8Linear per layer
+        self.layers = layers
+
+    @property
+    def nbytes(self):
+        """Memory held by the weights and biases"""
+        return sum(array.nbytes for layer in self.layers for array in vars(layer).values())
+
+    def logits(self, bags):
+        x = bags
+        for i, layer in enumerate(self.layers):
+            x = layer(x)
+            if i < len(self.layers) - 1:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def predict_proba(self, bags):
+        """Intent probabilities for a float32 bag-of-words matrix (softmax over the logits)"""
+        logits = self.logits(bags)
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def export_numpy(state, words, classes, path="model.npz", int8=False):
+    """
+    Writes a model.npz from a Neural_Network state dict given as numpy arrays
+    ({"fc1.weight": ..., ...}). With int8=True the weights are quantized
+    (quantize_int8) and stored with their scales. The file is replaced
+    atomically so a server watching it never loads a half-written model.
+    """
+    arrays = {}
+    for layer in LAYERS:
+        weight = np.asarray(state[f"{layer}.weight"], dtype=np.float32)
+        if int8:
+            arrays[f"{layer}.weight"], arrays[f"{layer}.scale"] = quantize_int8(weight)
+        else:
+            arrays[f"{layer}.weight"] = weight
+        arrays[f"{layer}.bias"] = np.asarray(state[f"{layer}.bias"])
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, words=np.array(words), classes=np.array(classes), **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_numpy_model(path="model.npz"):
+    """Returns (network, bag_of_words, classes) from a model.npz (fp32 or int8)"""
+    with np.load(path) as data:
+        layers = []
+        for layer in LAYERS:
+            if f"{layer}.scale" in data:
+                layers.append(Int8Linear(data[f"{layer}.weight"], data[f"{layer}.scale"], data[f"{layer}.bias"]))
+            else:
+                layers.append(Linear(data[f"{layer}.weight"], data[f"{layer}.bias"]))
+        network = NumpyNetwork(layers)
+        words = data["words"].tolist()
+        classes = data["classes"].tolist()
+    return network, BagOfWords(words), classes
+
+
+if __name__ == "__main__":
+    import argparse
+    import torch
+
+    parser = argparse.ArgumentParser(description="Export model.pth for NumPy-only inference.")
+    parser.add_argument("source", nargs="?", default="model.pth")
+    parser.add_argument("target", nargs="?")
+    parser.add_argument("--int8", action="store_true", help="quantize the weights to int8")
+    args = parser.parse_args()
+    target = args.target or ("model_int8.npz" if args.int8 else "model.npz")
+
+    data = torch.load(args.source, weights_only=True)
+    state = {name: tensor.numpy() for name, tensor in data['model_state'].items()}
+    export_numpy(state, data['words'], data['classes'], target, int8=args.int8)
+    print(f"Exported {args.source} to {target}")
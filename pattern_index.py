@@ -0,0 +1,120 @@
+"""
+TF-IDF nearest-neighbour index over the intents.json patterns.
+
+The intent model answers most messages; when it is unsure, the message is
+compared with every training pattern by cosine similarity and the intents of
+the closest patterns vote. train.py builds the index and saves it to
+pattern_index.npz next to model.pth.
+
+The index is stored as posting lists (word -> patterns containing it, with
+their weights), so a query only touches the patterns that share a word with
+it and scoring is one np.bincount, however many patterns there are.
+"""
+import os
+import numpy as np
+from utils import BagOfWords
+
+
+class PatternIndex:
+    def __init__(self, words, idf, offsets, pattern_ids, weights, pattern_tags, tags):
+        self.bag_of_words = BagOfWords(words)
+        self.idf = idf                    # (vocabulary,) float32
+        self.offsets = offsets            # (vocabulary + 1,) postings of word i are [offsets[i], offsets[i + 1])
+        self.pattern_ids = pattern_ids    # (postings,) int32
+        self.weights = weights            # (postings,) float32, L2-normalized tf-idf per pattern
+        self.pattern_tags = pattern_tags  # (patterns,) int32 index into tags
+        self.tags = tags
+
+    def __len__(self):
+        return len(self.pattern_tags)
+
+    @classmethod
+    def build(cls, documents):
+        """Builds the index from (tokens, tag) pairs, one per pattern."""
+        words = sorted({token for tokens, _ in documents for token in tokens})
+        tags = sorted({tag for _, tag in documents})
+        bag_of_words = BagOfWords(words)
+        tag_index = {tag: i for i, tag in enumerate(tags)}
+
+        # Term counts as (word, pattern, count) triples
+        rows, cols, counts = [], [], []
+        for pattern, (tokens, _) in enumerate(documents):
+            columns, token_counts = np.unique([bag_of_words.index[t] for t in tokens], return_counts=True)
+            rows.extend(columns)
+            cols.extend([pattern] * len(columns))
+            counts.extend(token_counts)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int32)
+        counts = np.array(counts, dtype=np.float32)
+
+        # Smoothed idf, as in scikit-learn: ln((1 + n) / (1 + df)) + 1
+        document_frequency = np.bincount(rows, minlength=len(words))
+        idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        weights = counts * idf[rows]
+        norms = np.sqrt(np.bincount(cols, weights=weights ** 2, minlength=len(documents)))
+        weights = (weights / np.where(norms > 0, norms, 1)[cols]).astype(np.float32)
+
+        order = np.argsort(rows, kind="stable")
+        offsets = np.zeros(len(words) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(rows, minlength=len(words)))
+        pattern_tags = np.array([tag_index[tag] for _, tag in documents], dtype=np.int32)
+        return cls(words, idf, offsets, cols[order], weights[order], pattern_tags, tags)
+
+    def save(self, path="pattern_index.npz"):
+        # Written to a temporary file and renamed, like numpy_network.export_numpy
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, words=np.array(self.bag_of_words.words), idf=self.idf, offsets=self.offsets,
+                 pattern_ids=self.pattern_ids, weights=self.weights, pattern_tags=self.pattern_tags,
+                 tags=np.array(self.tags))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path="pattern_index.npz"):
+        with np.load(path) as data:
+            return cls(data["words"].tolist(), data["idf"], data["offsets"], data["pattern_ids"],
+                       data["weights"], data["pattern_tags"], data["tags"].tolist())
+
+    def similarities(self, tokens):
+        """Cosine similarity of tokens to every pattern, as a (patterns,) array."""
+        columns, counts = np.unique([self.bag_of_words.index[t] for t in tokens if t in self.bag_of_words.index],
+                                    return_counts=True)
+        scores = np.zeros(len(self), dtype=np.float32)
+        if len(columns) == 0:
+            return scores
+
+        query = counts * self.idf[columns]
+        query /= np.linalg.norm(query)
+
+        # Gather the posting lists of the query words in one go
+        starts, ends = self.offsets[columns], self.offsets[columns + 1]
+        lengths = ends - starts
+        positions = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        query_weights = np.repeat(query, lengths)
+        scores += np.bincount(self.pattern_ids[positions], weights=self.weights[positions] * query_weights,
+                              minlength=len(self)).astype(np.float32)
+        return scores
+
+    def search(self, tokens, k=5):
+        """The k most similar patterns as [(tag, similarity)], best first; zero similarities are left out."""
+        scores = self.similarities(tokens)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.tags[self.pattern_tags[i]], float(scores[i])) for i in top if scores[i] > 0]
+
+    def classify(self, tokens, k=3):
+        """
+        Intent of the k nearest patterns, each voting with its similarity.
+
+        Returns:
+            (intent, similarity of its closest pattern), or (None, 0.0) if no pattern shares a word
+        """
+        neighbours = self.search(tokens, k)
+        if not neighbours:
+            return None, 0.0
+        votes = {}
+        for tag, similarity in neighbours:
+            votes[tag] = votes.get(tag, 0.0) + similarity
+        intent = max(votes, key=votes.get)
+        return intent, max(similarity for tag, similarity in neighbours if tag == intent)
@@ -0,0 +1,82 @@
+"""
+Formatting of API results into chatbot replies.
+Each formatter takes the dict returned by an api_functions get_* call.
+"""
+
+
+def format_next_race(race_data):
+    if "error" in race_data:
+        return "Sorry, I couldn't fetch the next race information."
+    return f" Next Race: {race_data['race_name']}\n" \
+           f" Circuit: {race_data['circuit']}, {race_data['country']}\n" \
+           f" Date: {race_data['date']}\n" \
+           f" Time: {race_data['time']}"
+
+
+def format_last_race(race_data):
+    if "error" in race_data:
+        return "Sorry, I couldn't fetch the last race results."
+
+    response = f" {race_data['race_name']} ({race_data['date']})\n"
+    response += f" {race_data['circuit']}\n\n"
+    response += " Podium:\n"
+    for driver in race_data['top_3']:
+        response += f"  {driver['position']}. {driver['driver']} ({driver['team']})\n"
+    return response
+
+
+def format_driver_standings(standings_data):
+    if "error" in standings_data:
+        return "Sorry, I couldn't fetch the driver standings."
+
+    response = f" {standings_data['season']} Driver Standings (Top 10):\n\n"
+    for driver in standings_data['standings']:
+        response += f"{driver['position']}. {driver['driver']} - {driver['points']} pts ({driver['wins']} wins)  Team: {driver['team']}\n"
+    return response
+
+
+def format_constructor_standings(standings_data):
+    if "error" in standings_data:
+        return "Sorry, I couldn't fetch the constructor standings."
+
+    response = f" {standings_data['season']} Constructor Standings:\n\n"
+    for team in standings_data['standings']:
+        response += f"{team['position']}. {team['constructor']} - {team['points']} pts ({team['wins']} wins)\n"
+    return response
+
+
+def format_driver_info(driver_data, driver_name):
+    if "error" in driver_data:
+        return f"Sorry, I couldn't find information about {driver_name}."
+
+    return f" {driver_data['full_name']}\n" \
+           f" Code: {driver_data['code']}\n" \
+           f" Number: {driver_data['number']}\n" \
+           f" Nationality: {driver_data['nationality']}\n" \
+           f" Born: {driver_data['birth_day']}\n" \
+           f" More info: {driver_data['url']}"
+
+
+def format_race_schedule(schedule_data):
+    if "error" in schedule_data:
+        return "Sorry, I couldn't fetch the race schedule."
+
+    response = f" {schedule_data['season']} F1 Calendar ({schedule_data['total_races']} races):\n\n"
+    for race in schedule_data['races'][:5]:  # Show first 5
+        response += f"Round {race['round']}: {race['race_name']} ({race['date']})\n"
+        response += f"   {race['circuit']}, {race['country']}\n"
+    response += f"\n... and {schedule_data['total_races'] - 5} more races!"
+    return response
+
+
+def format_race_winner(race_data):
+    if "error" in race_data: return "Sorry , couldn't find that race"
+    return f" race name :{race_data['race_name']} \n"\
+           f"winner : {race_data['winner']}\n"\
+           f"Team: {race_data['team']}\n"\
+           f"Date : {race_data['date']}"
+
+def format_race_winner_by_name(race_data, race):
+    if race_data.get('unknown_race'):
+        return f"Which round was {race}? Please specify the round number."
+    return format_race_winner(race_data)
@@ -0,0 +1,111 @@
+"""
+Race name -> round number, per season.
+
+"Who won Monaco 2021?" needs the round of Monaco in 2021 before
+get_race_winner can be called. The index is built from a season's
+get_race_schedule the first time that season is asked about, so a question
+costs one dict lookup (and the schedule call once per season), instead of
+a schedule fetch per question. The lookup happens in the API stage
+(api_functions.get_race_winner_by_name and its async_api twin), not while
+planning the reply.
+
+Every race is indexed under its race name (with and without "Grand Prix"),
+circuit, locality and country, and under the F1_RACES aliases that match
+one of those. When two races share a name (Bahrain and Sakhir are both in
+Bahrain), race names win over circuits and localities, those over
+countries, and the earlier round over the later one.
+"""
+import threading
+import time
+
+from utils import F1_RACES, normalize_name as normalize
+
+# Past seasons never change; the current one can (cancellations, new dates),
+# so a miss rebuilds it at most this often, in seconds
+CURRENT_SEASON_REFRESH = 60 * 60
+
+
+def _contains(text, phrase):
+    return f" {phrase} " in f" {text} "
+
+
+def build_rounds(races):
+    """{normalized alias: round} for the races of one get_race_schedule result"""
+    tiers = [[], [], []]  # (names, round) by priority: race name, circuit / locality, country
+    for race in races:
+        race_name = normalize(race['race_name'])
+        tiers[0].append(((race_name, race_name.replace(" grand prix", "")), race['round']))
+        tiers[1].append(((normalize(race['circuit']), normalize(race.get('locality') or "")), race['round']))
+        tiers[2].append(((normalize(race['country']),), race['round']))
+
+    rounds = {}
+    aliases = {normalize(alias) for alias in list(F1_RACES) + list(F1_RACES.values())}
+    for tier in tiers:
+        for names, round_number in tier:
+            for name in names:
+                if name:
+                    rounds.setdefault(name, round_number)
+            for alias in aliases:
+                if any(_contains(name, alias) for name in names):
+                    rounds.setdefault(alias, round_number)
+    return rounds
+
+
+class RoundIndex:
+    """
+    Per-season {alias: round} built from fetch_schedule(season) (by default
+    api_functions.get_race_schedule, so offline snapshots are used too).
+    """
+
+    def __init__(self, fetch_schedule=None, current_season_refresh=CURRENT_SEASON_REFRESH):
+        self.fetch_schedule = fetch_schedule
+        self.current_season_refresh = current_season_refresh
+        self.seasons = {}  # season -> (rounds, built at)
+        self._lock = threading.Lock()
+
+    def add_schedule(self, season, schedule):
+        """Indexes a get_race_schedule result for season (one with an "error" is ignored)"""
+        if "error" in schedule:
+            return
+        if schedule.get('stale'):
+            # Stale data (see api_functions.fetch) is used but rebuilt on the next miss
+            built_at = 0.0
+        else:
+            # A schedule from the snapshot is as old as its ingest, not as this build
+            age = time.time() - schedule['fetched_at'] if schedule.get('fetched_at') else 0.0
+            built_at = time.monotonic() - max(0.0, age)
+        entry = (build_rounds(schedule['races']), built_at)
+        with self._lock:
+            self.seasons[str(season)] = entry
+
+    def _may_refresh(self, season, built_at):
+        if built_at == 0.0:
+            return True
+        current = season == 'current' or season == str(time.localtime().tm_year)
+        return current and time.monotonic() - built_at >= self.current_season_refresh
+
+    def needs_schedule(self, season, race):
+        """True if race in season calls for (re)building the season from its schedule first"""
+        entry = self.seasons.get(str(season))
+        if entry is None:
+            return True
+        return normalize(race) not in entry[0] and self._may_refresh(str(season), entry[1])
+
+    def cached(self, season, race):
+        """Round number (a string, as Ergast returns it) of race in the season as indexed so far, or None"""
+        entry = self.seasons.get(str(season))
+        return entry[0].get(normalize(race)) if entry is not None else None
+
+    def lookup(self, season, race):
+        """Round number of race in season, fetching the season's schedule when needed, or None"""
+        if self.needs_schedule(season, race):
+            fetch_schedule = self.fetch_schedule
+            if fetch_schedule is None:
+                import api_functions
+                fetch_schedule = api_functions.get_race_schedule
+            self.add_schedule(season, fetch_schedule(str(season)))
+        return self.cached(season, race)
+
+
+# Shared by api_functions.get_race_winner_by_name and async_api.get_race_winner_by_name
+ROUND_INDEX = RoundIndex()
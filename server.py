@@ -0,0 +1,307 @@
+"""
+HTTP serving mode for the chatbot.
+
+    python server.py --port 8000 --workers 4
+
+POST /chat with {"message": "..."} returns {"reply": "..."}; GET /healthz
+reports the worker pid and the model it serves; GET /metrics returns the
+pipeline metrics of all workers in the Prometheus text format (each worker
+writes its snapshot to a shared directory, see metrics.py).
+
+The master process loads the model, intents, spaCy and the gazetteer once
+and then forks the workers, so their memory is shared copy-on-write instead
+of duplicated per worker. All workers accept on the same listening socket.
+When the model file changes (or on SIGHUP) the master loads the new weights,
+forks a new generation of workers and tells the old ones to finish their
+in-flight requests and exit, so no request is dropped during a reload.
+Only one worker of the current generation refreshes the hot responses (see
+hot_responses.py); the others read the replies it saves.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import api_functions
+import chatbot
+from metrics import METRICS, merge_snapshots, render_prometheus
+
+# Seconds between metric snapshots written by each worker
+METRICS_DUMP_INTERVAL = 5.0
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    server_version = "F1Chatbot/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_metrics()
+            return
+        if self.path != "/healthz":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, {"status": "ok", "pid": os.getpid(), "model_mtime": self.server.model_mtime})
+
+    def _send_metrics(self):
+        # This worker's numbers are current, the others' are up to METRICS_DUMP_INTERVAL old
+        directory = self.server.metrics_dir
+        dump_metrics(directory)
+        snapshots = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(directory, name), encoding="utf-8") as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # removed or replaced while listing
+        body = render_prometheus(merge_snapshots(snapshots)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            message = json.loads(self.rfile.read(length))["message"]
+            if not isinstance(message, str) or not message.strip():
+                raise ValueError("message must be a non-empty string")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"invalid request: {e}"})
+            return
+
+        try:
+            reply = chatbot.generate_response(message.strip())
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"reply": reply})
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class WorkerServer(ThreadingHTTPServer):
+    # Join request threads on server_close() so a draining worker finishes them
+    daemon_threads = False
+    block_on_close = True
+
+
+def _model_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def dump_metrics(directory):
+    METRICS.dump(os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def run_worker(listener, model_mtime, workers, access_log, hot_responses_path, refresher, metrics_dir):
+    """
+    Body of a forked worker: serves on the inherited socket until SIGTERM.
+    The refresher worker keeps the hot responses at hot_responses_path up to
+    date, the others read them from there (None: no hot responses).
+    """
+    # Parent state that must not be shared: SQLite connections, keep-alive
+    # sockets, the random state used to pick replies, and torch's thread pool
+    # when serving model.pth (one intra-op thread per worker avoids
+    # oversubscribing the cores)
+    api_functions.reconnect(share=workers)
+    random.seed()
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(1)
+    if hot_responses_path and refresher:
+        chatbot.HOT_RESPONSES.start(hot_responses_path)
+    elif hot_responses_path:
+        chatbot.HOT_RESPONSES.follow(hot_responses_path)
+
+    # Counted from zero in each worker; the files of exited workers stay in
+    # metrics_dir, so the merged counters never go down
+    METRICS.reset()
+    stopped = threading.Event()
+
+    def dump_periodically():
+        while not stopped.wait(METRICS_DUMP_INTERVAL):
+            dump_metrics(metrics_dir)
+
+    threading.Thread(target=dump_periodically, daemon=True).start()
+
+    server = WorkerServer(listener.getsockname(), ChatHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    server.model_mtime = model_mtime
+    server.access_log = access_log
+    server.metrics_dir = metrics_dir
+
+    # shutdown() blocks until serve_forever() returns, so it can't run in the
+    # signal handler (which interrupts serve_forever in this same thread)
+    def drain(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.serve_forever()
+    server.server_close()  # waits for in-flight requests
+    stopped.set()
+    dump_metrics(metrics_dir)
+
+
+class Master:
+    """Forks and supervises the workers, and reloads them when the model changes."""
+
+    def __init__(self, host, port, workers, model_path=None, reload_interval=2.0,
+                 access_log=False, hot_responses=True):
+        self.workers = workers
+        self.model_path = model_path or chatbot.default_model_path()
+        self.reload_interval = reload_interval
+        self.access_log = access_log
+        self.children = {}  # pid -> generation
+        self.refresher = None  # pid of the worker refreshing the hot responses
+        self.generation = 0
+        self.model_mtime = None
+        self._stopping = False
+        self._reload_requested = False
+        self.metrics_dir = tempfile.mkdtemp(prefix="f1-metrics-")
+        self.hot_responses_path = os.path.join(self.metrics_dir, "hot_responses.data") if hot_responses else None
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(1024)
+
+    def _spawn(self):
+        # The first worker of a generation refreshes, and whichever replaces it if it dies
+        refresher = self.children.get(self.refresher) != self.generation
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)  # until the worker installs its own
+            code = 0
+            try:
+                run_worker(self.listener, self.model_mtime, self.workers, self.access_log,
+                           self.hot_responses_path, refresher, self.metrics_dir)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        self.children[pid] = self.generation
+        if refresher:
+            self.refresher = pid
+
+    def _spawn_generation(self):
+        # Objects created so far (model, spaCy, gazetteer) are never collected;
+        # freezing them keeps the cyclic GC from writing to their pages in the
+        # workers, which would un-share them
+        gc.collect()
+        gc.freeze()
+        self.generation += 1
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _stop_generations_before(self, generation):
+        for pid, child_generation in self.children.items():
+            if child_generation < generation:
+                os.kill(pid, signal.SIGTERM)
+
+    def _reap(self):
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            # A worker of the current generation died on its own: replace it
+            if generation == self.generation and not self._stopping:
+                print(f"Worker {pid} exited ({status}), restarting it")
+                self._spawn()
+
+    def reload(self):
+        """Loads the current model file and replaces the workers with ones serving it."""
+        mtime = _model_mtime(self.model_path)
+        try:
+            chatbot.reload_model(self.model_path)
+        except Exception as e:
+            print(f"Reload failed, still serving the previous model: {e}")
+            self.model_mtime = mtime  # don't retry until the file changes again
+            return
+        self.model_mtime = mtime
+        print(f"Loaded {self.model_path}, starting workers")
+        self._spawn_generation()
+        self._stop_generations_before(self.generation)
+
+    def _request_reload(self, signum, frame):
+        self._reload_requested = True
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def serve(self):
+        chatbot.load_model(self.model_path)
+        chatbot.warmup()
+        self.model_mtime = _model_mtime(self.model_path)
+        self._spawn_generation()
+
+        signal.signal(signal.SIGHUP, self._request_reload)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        host, port = self.listener.getsockname()
+        print(f"Serving on http://{host}:{port}/chat with {self.workers} workers (pid {os.getpid()})")
+
+        while not self._stopping:
+            time.sleep(self.reload_interval)
+            self._reap()
+            if self._reload_requested or _model_mtime(self.model_path) != self.model_mtime:
+                self._reload_requested = False
+                self.reload()
+
+        print("Shutting down, waiting for in-flight requests")
+        self._stop_generations_before(self.generation + 1)
+        for pid in list(self.children):
+            os.waitpid(pid, 0)
+        self.listener.close()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the F1 chatbot over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--model", help="model file to serve and watch (default: model.npz if present, else model.pth)")
+    parser.add_argument("--reload-interval", type=float, default=2.0,
+                        help="seconds between checks for a changed model file")
+    parser.add_argument("--access-log", action="store_true", help="log every request")
+    parser.add_argument("--no-hot-responses", dest="hot_responses", action="store_false",
+                        help="don't precompute the hot intents in the workers")
+    args = parser.parse_args()
+
+    Master(args.host, args.port, args.workers, args.model, args.reload_interval,
+           args.access_log, args.hot_responses).serve()
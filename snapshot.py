@@ -0,0 +1,418 @@
+"""
+Offline season snapshot store.
+Bulk-loads races, results, standings and drivers into a local indexed SQLite
+database so the api_functions get_* calls can answer without a network
+round-trip.
+
+Usage:
+    python snapshot.py ingest 2010 2024      # download seasons from the Ergast API
+    python snapshot.py import-csv f1db_csv/  # import an Ergast CSV dump directory
+    python snapshot.py refresh               # re-download the current season only
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from api_cache import CURRENT_SEASON_TTL
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    "F1_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "f1_snapshot.sqlite")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS races (
+    season INTEGER, round INTEGER, race_name TEXT, date TEXT, time TEXT,
+    circuit_id TEXT, circuit_name TEXT, locality TEXT, country TEXT,
+    PRIMARY KEY (season, round));
+CREATE TABLE IF NOT EXISTS results (
+    season INTEGER, round INTEGER, position INTEGER, driver_id TEXT,
+    driver_name TEXT, constructor TEXT,
+    PRIMARY KEY (season, round, position));
+CREATE TABLE IF NOT EXISTS driver_standings (
+    season INTEGER, position INTEGER, driver_id TEXT, driver_name TEXT,
+    team TEXT, points TEXT, wins TEXT,
+    PRIMARY KEY (season, position));
+CREATE TABLE IF NOT EXISTS constructor_standings (
+    season INTEGER, position INTEGER, constructor TEXT, nationality TEXT,
+    points TEXT, wins TEXT,
+    PRIMARY KEY (season, position));
+CREATE TABLE IF NOT EXISTS seasons (
+    season INTEGER PRIMARY KEY, ingested_at REAL);
+CREATE TABLE IF NOT EXISTS drivers (
+    driver_id TEXT PRIMARY KEY, given_name TEXT, family_name TEXT, code TEXT,
+    permanent_number TEXT, nationality TEXT, date_of_birth TEXT, url TEXT);
+"""
+
+
+def _season(year):
+    """Season number for a year argument ('current', '2021' or 2021), or None."""
+    if year == 'current':
+        return date.today().year
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotStore:
+    """
+    Read/write access to the snapshot database.
+    The query methods return the same dicts as the matching api_functions
+    get_* function, or None when the snapshot does not cover the request.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_if_exists(cls, path=DEFAULT_SNAPSHOT_PATH):
+        """The store at path if a snapshot was ingested there, else None."""
+        return cls(path) if path and os.path.exists(path) else None
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def _ingested_at(self, season):
+        rows = self._query("SELECT ingested_at FROM seasons WHERE season = ?", (season,))
+        return rows[0][0] if rows else None
+
+    def _is_current(self, season):
+        """
+        False for the running season once its rows are older than
+        CURRENT_SEASON_TTL: its standings change after every race, so the
+        API (and its cache) answer instead until it is ingested again.
+        """
+        if season is None or season < date.today().year:
+            return True
+        ingested_at = self._ingested_at(season)
+        return ingested_at is not None and time.time() - ingested_at < CURRENT_SEASON_TTL
+
+    ### QUERIES ###
+
+    def race_winner(self, year, round_number):
+        rows = self._query(
+            "SELECT r.race_name, r.date, x.driver_name, x.constructor FROM races r"
+            " JOIN results x ON x.season = r.season AND x.round = r.round AND x.position = 1"
+            " WHERE r.season = ? AND r.round = ?",
+            (_season(year), int(round_number)),
+        )
+        if not rows:
+            return None
+        race_name, race_date, winner, team = rows[0]
+        return {"race_name": race_name, "date": race_date, "winner": winner, "team": team}
+
+    def driver_standings(self, year='current'):
+        season = _season(year)
+        if not self._is_current(season):
+            return None
+        rows = self._query(
+            "SELECT position, driver_name, team, points, wins FROM driver_standings"
+            " WHERE season = ? ORDER BY position LIMIT 10",
+            (season,),
+        )
+        if not rows:
+            return None
+        return {
+            "season": str(season),
+            "standings": [
+                {"position": str(position), "driver": driver, "team": team, "points": points, "wins": wins}
+                for position, driver, team, points, wins in rows
+            ],
+        }
+
+    def constructor_standings(self, year='current'):
+        season = _season(year)
+        if not self._is_current(season):
+            return None
+        rows = self._query(
+            "SELECT position, constructor, nationality, points, wins FROM constructor_standings"
+            " WHERE season = ? ORDER BY position",
+            (season,),
+        )
+        if not rows:
+            return None
+        return {
+            "season": str(season),
+            "standings": [
+                {"position": str(position), "constructor": constructor, "nationality": nationality,
+                 "points": points, "wins": wins}
+                for position, constructor, nationality, points, wins in rows
+            ],
+        }
+
+    def race_schedule(self, year='current'):
+        season = _season(year)
+        if not self._is_current(season):
+            return None
+        rows = self._query(
+            "SELECT round, race_name, date, circuit_name, country, locality FROM races"
+            " WHERE season = ? ORDER BY round",
+            (season,),
+        )
+        if not rows:
+            return None
+        races = [
+            {"round": str(round_number), "race_name": race_name, "date": race_date,
+             "circuit": circuit, "country": country, "locality": locality}
+            for round_number, race_name, race_date, circuit, country, locality in rows
+        ]
+        schedule = {"season": year, "total_races": len(races), "races": races}
+        # How old the rows are, for round_index.RoundIndex
+        ingested_at = self._ingested_at(season)
+        if ingested_at is not None:
+            schedule["fetched_at"] = ingested_at
+        return schedule
+
+    def driver_info(self, driver_id):
+        rows = self._query(
+            "SELECT given_name, family_name, code, permanent_number, nationality, date_of_birth, url"
+            " FROM drivers WHERE driver_id = ?",
+            (driver_id,),
+        )
+        if not rows:
+            return None
+        given_name, family_name, code, number, nationality, birth_day, url = rows[0]
+        return {
+            "full_name": f"{given_name} {family_name}",
+            "code": code or 'N/A',
+            "number": number or 'N/A',
+            "nationality": nationality,
+            "birth_day": birth_day,
+            "url": url,
+        }
+
+    def seasons(self):
+        return [season for (season,) in self._query("SELECT DISTINCT season FROM races ORDER BY season")]
+
+    ### WRITES ###
+
+    def replace_season(self, season, races, results, driver_standings, constructor_standings):
+        """Replaces everything stored for one season in a single transaction, and records when."""
+        with self._lock, self._db:
+            for table in ("races", "results", "driver_standings", "constructor_standings"):
+                self._db.execute(f"DELETE FROM {table} WHERE season = ?", (season,))
+            self._db.execute("INSERT OR REPLACE INTO seasons VALUES (?, ?)", (season, time.time()))
+            self._db.executemany("INSERT INTO races VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", races)
+            self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", results)
+            self._db.executemany("INSERT INTO driver_standings VALUES (?, ?, ?, ?, ?, ?, ?)", driver_standings)
+            self._db.executemany("INSERT INTO constructor_standings VALUES (?, ?, ?, ?, ?, ?)",
+                                 constructor_standings)
+
+    def upsert_drivers(self, drivers):
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO drivers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", drivers)
+
+
+### INGESTION FROM THE API ###
+
+def fetch_all_pages(path, table, key, page_size=100):
+    """
+    Follows Ergast's limit/offset paging for BASE_URL/path and returns the
+    concatenated MRData[table][key] lists (None if a page could not be fetched).
+    """
+    import api_functions
+
+    items = []
+    offset = 0
+    while True:
+        url = f"{api_functions.BASE_URL}/{path}.json?limit={page_size}&offset={offset}"
+        data = api_functions.get_json_response(url)
+        if not data:
+            return None
+        page = data['MRData'][table][key]
+        items.extend(page)
+        offset += int(data['MRData'].get('limit', page_size))
+        if not page or offset >= int(data['MRData'].get('total', 0)):
+            return items
+
+
+def _driver_row(driver):
+    return (driver['driverId'], driver['givenName'], driver['familyName'], driver.get('code'),
+            driver.get('permanentNumber'), driver.get('nationality'), driver.get('dateOfBirth'),
+            driver.get('url'))
+
+
+def _standings(season, kind):
+    lists = fetch_all_pages(f"{season}/{kind}", 'StandingsTable', 'StandingsLists')
+    if not lists:
+        return []
+    key = 'DriverStandings' if kind == 'driverStandings' else 'ConstructorStandings'
+    return [entry for standings_list in lists for entry in standings_list[key]]
+
+
+def ingest_season(store, season):
+    """Downloads one season from the API and replaces it in the store. Returns the number of races."""
+    schedule = fetch_all_pages(str(season), 'RaceTable', 'Races')
+    raced = fetch_all_pages(f"{season}/results", 'RaceTable', 'Races')
+    if schedule is None or raced is None:
+        raise RuntimeError(f"Could not download season {season}")
+
+    races = [
+        (season, int(race['round']), race['raceName'], race['date'], race.get('time'),
+         race['Circuit']['circuitId'], race['Circuit']['circuitName'],
+         race['Circuit']['Location']['locality'], race['Circuit']['Location']['country'])
+        for race in schedule
+    ]
+
+    # A race's results can be split across two pages; rows are keyed by position
+    results = []
+    for race in raced:
+        for result in race['Results']:
+            if not result['position'].isdigit():
+                continue
+            driver = result['Driver']
+            results.append((season, int(race['round']), int(result['position']), driver['driverId'],
+                            f"{driver['givenName']} {driver['familyName']}", result['Constructor']['name']))
+
+    driver_standings = [
+        (season, int(entry['position']), entry['Driver']['driverId'],
+         f"{entry['Driver']['givenName']} {entry['Driver']['familyName']}",
+         entry['Constructors'][0]['name'] if entry['Constructors'] else None,
+         entry['points'], entry['wins'])
+        for entry in _standings(season, 'driverStandings') if 'position' in entry
+    ]
+    constructor_standings = [
+        (season, int(entry['position']), entry['Constructor']['name'],
+         entry['Constructor']['nationality'], entry['points'], entry['wins'])
+        for entry in _standings(season, 'constructorStandings') if 'position' in entry
+    ]
+
+    store.replace_season(season, races, results, driver_standings, constructor_standings)
+    return len(races)
+
+
+def ingest_drivers(store):
+    drivers = fetch_all_pages("drivers", 'DriverTable', 'Drivers')
+    if drivers is None:
+        raise RuntimeError("Could not download the driver list")
+    store.upsert_drivers([_driver_row(driver) for driver in drivers])
+    return len(drivers)
+
+
+### INGESTION FROM AN ERGAST CSV DUMP ###
+
+def _read_csv(directory, name):
+    with open(os.path.join(directory, f"{name}.csv"), newline="", encoding="utf-8") as f:
+        return [{key: (None if value == "\\N" else value) for key, value in row.items()}
+                for row in csv.DictReader(f)]
+
+
+def import_csv_dump(store, directory, first_season=None, last_season=None):
+    """
+    Imports an Ergast CSV dump (races.csv, results.csv, drivers.csv, constructors.csv,
+    circuits.csv, driver_standings.csv, constructor_standings.csv). Returns the seasons imported.
+    """
+    circuits = {row['circuitId']: row for row in _read_csv(directory, "circuits")}
+    constructors = {row['constructorId']: row for row in _read_csv(directory, "constructors")}
+    drivers = {row['driverId']: row for row in _read_csv(directory, "drivers")}
+    races = {row['raceId']: row for row in _read_csv(directory, "races")
+             if (first_season is None or int(row['year']) >= first_season)
+             and (last_season is None or int(row['year']) <= last_season)}
+
+    def driver_name(driver_id):
+        return f"{drivers[driver_id]['forename']} {drivers[driver_id]['surname']}"
+
+    seasons = {}
+    for race in races.values():
+        circuit = circuits[race['circuitId']]
+        seasons.setdefault(int(race['year']), {"races": [], "results": [], "last_race": None})
+        season = seasons[int(race['year'])]
+        season["races"].append((int(race['year']), int(race['round']), race['name'], race['date'],
+                                race.get('time'), circuit['circuitRef'], circuit['name'],
+                                circuit['location'], circuit['country']))
+
+    last_team = {}  # (season, driverId) -> constructor of the driver's latest race
+    for row in sorted(_read_csv(directory, "results"),
+                      key=lambda r: int(races[r['raceId']]['round']) if r['raceId'] in races else 0):
+        race = races.get(row['raceId'])
+        if race is None:
+            continue
+        year = int(race['year'])
+        team = constructors[row['constructorId']]['name']
+        last_team[(year, row['driverId'])] = team
+        if row['position'] is None:
+            continue
+        seasons[year]["results"].append((year, int(race['round']), int(row['position']),
+                                         drivers[row['driverId']]['driverRef'],
+                                         driver_name(row['driverId']), team))
+
+    # Season standings are the standings after each season's last raced round
+    standings_race = {}
+    for table in ("driver_standings", "constructor_standings"):
+        for row in _read_csv(directory, table):
+            race = races.get(row['raceId'])
+            if race is None:
+                continue
+            year = int(race['year'])
+            if int(race['round']) >= int(races[standings_race.get(year, row['raceId'])]['round']):
+                standings_race[year] = row['raceId']
+
+    driver_standings = {year: [] for year in seasons}
+    for row in _read_csv(directory, "driver_standings"):
+        race = races.get(row['raceId'])
+        if race is None or standings_race.get(int(race['year'])) != row['raceId'] or row['position'] is None:
+            continue
+        year = int(race['year'])
+        driver_standings[year].append((year, int(row['position']), drivers[row['driverId']]['driverRef'],
+                                       driver_name(row['driverId']), last_team.get((year, row['driverId'])),
+                                       row['points'], row['wins']))
+
+    constructor_standings = {year: [] for year in seasons}
+    for row in _read_csv(directory, "constructor_standings"):
+        race = races.get(row['raceId'])
+        if race is None or standings_race.get(int(race['year'])) != row['raceId'] or row['position'] is None:
+            continue
+        year = int(race['year'])
+        constructor = constructors[row['constructorId']]
+        constructor_standings[year].append((year, int(row['position']), constructor['name'],
+                                            constructor['nationality'], row['points'], row['wins']))
+
+    for year, season in seasons.items():
+        store.replace_season(year, season["races"], season["results"],
+                             driver_standings[year], constructor_standings[year])
+
+    store.upsert_drivers([
+        (row['driverRef'], row['forename'], row['surname'], row.get('code'), row.get('number'),
+         row.get('nationality'), row.get('dob'), row.get('url'))
+        for row in drivers.values()
+    ])
+    return sorted(seasons)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline F1 snapshot database.")
+    parser.add_argument("--db", default=DEFAULT_SNAPSHOT_PATH, help="snapshot database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="download seasons from the Ergast API")
+    ingest.add_argument("first_season", type=int)
+    ingest.add_argument("last_season", type=int)
+
+    import_csv = commands.add_parser("import-csv", help="import an Ergast CSV dump directory")
+    import_csv.add_argument("directory")
+    import_csv.add_argument("--from", dest="first_season", type=int)
+    import_csv.add_argument("--to", dest="last_season", type=int)
+
+    commands.add_parser("refresh", help="re-download the current season only")
+
+    args = parser.parse_args()
+    store = SnapshotStore(args.db)
+
+    if args.command == "ingest":
+        for season in range(args.first_season, args.last_season + 1):
+            print(f"Season {season}: {ingest_season(store, season)} races")
+        print(f"Drivers: {ingest_drivers(store)}")
+    elif args.command == "import-csv":
+        seasons = import_csv_dump(store, args.directory, args.first_season, args.last_season)
+        print(f"Imported {len(seasons)} seasons")
+    else:
+        season = date.today().year
+        print(f"Season {season}: {ingest_season(store, season)} races")
@@ -1,5 +1,28 @@
+import functools
 from chatbot import extract_driver_hybrid, extract_team_hybrid, extract_year
 
+# Module globals the stand-in Ergast tests replace (see benchmark.use_stand_in_ergast)
+REPLACED_GLOBALS = {
+    "api_functions": ("BASE_URL", "session", "breaker", "response_cache"),
+    "async_api": ("client",),
+    "chatbot": ("MESSAGE_BUDGET",),
+}
+
+def restores_globals(test_function):
+    """Puts back REPLACED_GLOBALS after test_function, so the tests can run in any order."""
+    @functools.wraps(test_function)
+    def wrapper(*args, **kwargs):
+        import importlib
+        saved = [(module, name, getattr(module, name))
+                 for module, names in ((importlib.import_module(m), n) for m, n in REPLACED_GLOBALS.items())
+                 for name in names]
+        try:
+            return test_function(*args, **kwargs)
+        finally:
+            for module, name, value in saved:
+                setattr(module, name, value)
+    return wrapper
+
 def test() :
     tests = [
         # Dictionary should catch these
@@ -20,5 +43,327 @@ def test() :
         print(f"input : {test}")
         print(f"excepted : {excepted}")
         print(f" {status} Go  :t{result}")
+
+def test_clean_text():
+    # The fast tokenizer and lemma cache must give exactly the NLTK pipeline's output.
+    # word_tokenize runs with preserve_line=True: Punkt can't split [a-z\s] text anyway
+    import json, re
+    import nltk
+    from utils import clean_text, lemmatizer
+
+    def reference(sentence):
+        sentence = re.sub(r'[^a-z\s]', "", sentence.lower())
+        return [lemmatizer.lemmatize(word) for word in nltk.word_tokenize(sentence, preserve_line=True)]
+
+    with open("intents.json", "r", encoding="utf-8") as f:
+        sentences = [pattern for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+    sentences += [
+        "I cannot believe it", "gimme the standings", "gonna win?", "we gotta go", "lemme see",
+        "I wanna know", "wanna", "wannabe champion", "Cannot\tstop\nnow", "can not", "  ", "",
+        "Who won?! (2021) -- Hamilton's race", "déjà vu at Monza", "Pérez\u00a0wins",
+    ]
+
+    mismatches = [s for s in sentences if clean_text(s) != reference(s)]
+    status = "✅" if not mismatches else "❌"
+    print(f" {status} clean_text : {len(sentences) - len(mismatches)}/{len(sentences)} sentences match NLTK")
+    for sentence in mismatches:
+        print(f"    {sentence!r}: {clean_text(sentence)} != {reference(sentence)}")
+
+def test_numpy_parity():
+    # The torch-free model.npz must predict the same intents as model.pth
+    import json, os, tempfile
+    import numpy as np
+    import torch
+    from network import Neural_Network
+    from numpy_network import export_numpy, load_numpy_model
+    from utils import BagOfWords, clean_text
+
+    data = torch.load("model.pth", weights_only=True)
+    torch_model = Neural_Network(data['input_size'], data['output_size'])
+    torch_model.load_state_dict(data['model_state'])
+    torch_model.eval()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.npz")
+        export_numpy({name: tensor.numpy() for name, tensor in data['model_state'].items()},
+                     data['words'], data['classes'], path)
+        numpy_model, bag_of_words, classes = load_numpy_model(path)
+
+    with open("intents.json", "r", encoding="utf-8") as f:
+        sentences = [pattern for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+    sentences += ["Who won Monaco 2021?", "asdf qwerty", ""]
+
+    bags = BagOfWords(data['words']).transform([clean_text(s) for s in sentences])
+    torch_probabilities = torch_model.predict_proba(bags)
+    numpy_probabilities = numpy_model.predict_proba(bags)
+
+    mismatches = int((torch_probabilities.argmax(axis=1) != numpy_probabilities.argmax(axis=1)).sum())
+    max_difference = float(np.abs(torch_probabilities - numpy_probabilities).max())
+    status = "✅" if mismatches == 0 and max_difference < 1e-5 and classes == data['classes'] else "❌"
+    print(f" {status} NumPy parity : {len(sentences) - mismatches}/{len(sentences)} intents match,"
+          f" max probability difference {max_difference:.2e}")
+
+def test_round_index():
+    """Race names, circuits, localities, countries and F1_RACES aliases resolve to rounds, one schedule fetch per season."""
+    from round_index import RoundIndex
+
+    schedule = {"season": "2021", "total_races": 4, "races": [
+        {"round": "1", "race_name": "Bahrain Grand Prix", "circuit": "Bahrain International Circuit",
+         "locality": "Sakhir", "country": "Bahrain"},
+        {"round": "5", "race_name": "Monaco Grand Prix", "circuit": "Circuit de Monaco",
+         "locality": "Monte-Carlo", "country": "Monaco"},
+        {"round": "12", "race_name": "Belgian Grand Prix", "circuit": "Circuit de Spa-Francorchamps",
+         "locality": "Spa", "country": "Belgium"},
+        {"round": "19", "race_name": "São Paulo Grand Prix", "circuit": "Autódromo José Carlos Pace",
+         "locality": "São Paulo", "country": "Brazil"},
+    ]}
+    fetches = []
+    index = RoundIndex(fetch_schedule=lambda season: fetches.append(season) or schedule)
+    tests = [("Monaco", "5"), ("Spa", "12"), ("Belgian Grand Prix", "12"), ("Brazil", "19"),
+             ("sao paulo", "19"), ("Bahrain", "1"), ("Sakhir", "1"), ("Monza", None)]
+    wrong = [(race, index.lookup(2021, race)) for race, expected in tests if index.lookup(2021, race) != expected]
+    status = "✅" if not wrong and fetches == ["2021"] else "❌"
+    print(f" {status} round index : {len(tests) - len(wrong)}/{len(tests)} races resolved, "
+          f"{len(fetches)} schedule fetch(es) {wrong or ''}")
+
+@restores_globals
+def test_driver_registry(total=850, page_size=300):
+    """The registry pages through a stand-in /drivers, saves it, and resolves names, codes and numbers locally."""
+    import json
+    import os
+    import tempfile
+    import threading
+    import time
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+    import api_functions
+    from benchmark import use_stand_in_ergast
+    from driver_registry import DriverRegistry
+
+    drivers = [{"driverId": f"driver_{i}", "givenName": f"Given{i}", "familyName": f"Family{i}",
+                "dateOfBirth": "1950-01-01"} for i in range(total - 4)]
+    drivers += [
+        {"driverId": "max_verstappen", "givenName": "Max", "familyName": "Verstappen", "code": "VER",
+         "permanentNumber": "33", "dateOfBirth": "1997-09-30"},
+        {"driverId": "verstappen", "givenName": "Jos", "familyName": "Verstappen", "dateOfBirth": "1972-03-04"},
+        {"driverId": "perez", "givenName": "Sergio", "familyName": "Pérez", "code": "PER",
+         "permanentNumber": "11", "dateOfBirth": "1990-01-26"},
+        {"driverId": "giovinazzi", "givenName": "Antonio", "familyName": "Giovinazzi", "code": "GIO",
+         "permanentNumber": "99", "dateOfBirth": "1993-12-14"},
+    ]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            limit, offset = int(query["limit"][0]), int(query["offset"][0])
+            server.hits += 1
+            body = json.dumps({"MRData": {"limit": str(min(limit, page_size)), "offset": str(offset),
+                                          "total": str(len(drivers)),
+                                          "DriverTable": {"Drivers": drivers[offset:offset + min(limit, page_size)]}}})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    use_stand_in_ergast(server)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "driver_registry.json")
+        count = DriverRegistry(path).refresh()
+        registry = DriverRegistry(path)  # from the saved file, no download
+        tests = [("Max Verstappen", "max_verstappen"), ("Verstappen", "max_verstappen"),
+                 ("Jos Verstappen", "verstappen"), ("VER", "max_verstappen"), ("33", "max_verstappen"),
+                 ("Sergio Perez", "perez"), ("Pérez", "perez"), ("Antonio Giovinazzi", "giovinazzi"),
+                 ("Given500 Family500", "driver_500"), ("Nobody", None)]
+        wrong = [(name, registry.index.get(name.lower())) for name, expected in tests
+                 if registry.driver_id(name) != expected]
+        start = time.perf_counter()
+        for _ in range(10000):
+            registry.driver_id("Antonio Giovinazzi")
+        lookup_us = (time.perf_counter() - start) * 100
+
+    status = "✅" if count == total and len(registry) == total and not wrong and server.hits == 3 else "❌"
+    print(f" {status} driver registry : {len(registry)} drivers in {server.hits} pages, "
+          f"{len(tests) - len(wrong)}/{len(tests)} names resolved, {lookup_us:.1f} us/lookup {wrong or ''}")
+    server.shutdown()
+
+@restores_globals
+def test_single_flight(callers=50, delay=0.2):
+    """A burst of identical get_next_race calls (threads, then asyncio) makes one upstream request."""
+    import asyncio
+    import threading
+    import api_functions
+    import async_api
+    from benchmark import start_stand_in_ergast, use_stand_in_ergast
+
+    server = start_stand_in_ergast(delay)
+    use_stand_in_ergast(server)
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+
+    def call(i):
+        barrier.wait()
+        results[i] = api_functions.get_next_race()
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shared = all(result is results[0] for result in results) and "error" not in results[0]
+    status = "✅" if server.hits == 1 and shared else "❌"
+    print(f" {status} single-flight, threads : {callers} callers -> {server.hits} upstream request(s)")
+
+    async def burst():
+        async_api.client = async_api.AsyncErgastClient(rate_limiters=[])
+        try:
+            return await asyncio.gather(*(async_api.get_next_race() for _ in range(callers)))
+        finally:
+            await async_api.client.close()
+
+    server.hits = 0
+    results = asyncio.run(burst())
+    shared = all(result is results[0] for result in results) and "error" not in results[0]
+    status = "✅" if server.hits == 1 and shared else "❌"
+    print(f" {status} single-flight, asyncio : {callers} callers -> {server.hits} upstream request(s)")
+    server.shutdown()
+
+@restores_globals
+def test_deadline(budget=0.3, delay=1.0):
+    """A slow Ergast is answered from stale data within the budget; a failing one trips the breaker."""
+    import socket
+    import time
+    import api_functions
+    import chatbot
+    from api_cache import ResponseCache
+    from http_client import ErgastSession, CircuitBreaker
+    from benchmark import start_stand_in_ergast, use_stand_in_ergast
+
+    server = start_stand_in_ergast(0.0)
+    use_stand_in_ergast(server)
+    api_functions.response_cache = ResponseCache(path=None)
+    chatbot.MESSAGE_BUDGET = budget
+    message = "When is the next race?"
+    chatbot.generate_response(message)
+    api_functions.response_cache.peek(f"{api_functions.BASE_URL}/current/next.json").expires_at = 0
+
+    server.delay = delay
+    start = time.perf_counter()
+    reply = chatbot.generate_response(message)
+    elapsed = time.perf_counter() - start
+    status = "✅" if elapsed < budget + 0.1 and reply.endswith(chatbot.STALE_NOTE) else "❌"
+    print(f" {status} deadline : {delay:.1f} s upstream answered from stale data in {elapsed:.2f} s")
+
+    time.sleep(delay)  # the background refresh lands in the cache
+    reply = chatbot.generate_response(message)
+    status = "✅" if not reply.endswith(chatbot.STALE_NOTE) else "❌"
+    print(f" {status} deadline : background refresh served the next message fresh")
+    server.shutdown()
+
+    # Nothing listens on this port
+    probe = socket.socket()
+    probe.bind(("127.0.0.1", 0))
+    api_functions.BASE_URL = f"http://127.0.0.1:{probe.getsockname()[1]}/api/f1"
+    probe.close()
+    api_functions.session = ErgastSession(max_retries=0, rate_limits=())
+    api_functions.breaker = CircuitBreaker(threshold=3, cooldown=30.0)
+    for _ in range(3):
+        api_functions.get_json_response(f"{api_functions.BASE_URL}/2020.json")
+    start = time.perf_counter()
+    api_functions.get_json_response(f"{api_functions.BASE_URL}/2020.json")
+    elapsed = (time.perf_counter() - start) * 1000
+    status = "✅" if api_functions.breaker.state == "open" and elapsed < 5 else "❌"
+    print(f" {status} circuit breaker : {api_functions.breaker.state} after 3 failures, next call {elapsed:.2f} ms")
+
+def test_typo_index():
+    """Misspelled drivers, teams and races resolve; common words near an alias and the training patterns don't."""
+    import json
+    import chatbot
+    import typo_index
+
+    index = typo_index.get_typo_index()
+    tests = [("tell me about verstapen", "driver", "Max Verstappen"), ("who is leclrec", "driver", "Charles Leclerc"),
+             ("how is ferarri doing", "team", "Scuderia Ferrari"), ("aston martn", "team", "Aston Martin F1 Team"),
+             ("who won silverstne", "race", "Silverstone"), ("abu dabi 2021", "race", "Abu Dhabi"),
+             ("mclarne", "team", "McLaren F1 Team"), ("onrris", "driver", "Lando Norris"),
+             ("mercedez", "team", "Mercedes-AMG Petronas")]
+    wrong = [text for text, label, name in tests if index.find(text).get(label, (None,))[0] != name]
+    with open("intents.json", "r", encoding="utf-8") as f:
+        patterns = [p for intent in json.load(f)['intents'] for p in intent['patterns']]
+    # English words one edit from an alias at its first or last letter
+    patterns += ["carlo", "suzuki", "landon", "vetter", "peres", "oscars", "he is a saint", "tell me about william",
+                 "justin", "check the standings", "dustin", "morris", "charley", "the car was vetted", "where it lands"]
+    # and inside it, which only WordNet tells from typos
+    english = ["i am hungry", "a deep gorge", "charges", "austen", "cargos", "carols"]
+    wordnet = typo_index.is_english_word("hungry")
+    if wordnet:
+        patterns += english
+    false_positives = [p for p in patterns if index.find(p)]
+    # The words on either side of an exact mention are not a phrase
+    across = index.find_all("aston hamilton martn", skip=[(6, 14)])
+    status = "✅" if not wrong and not false_positives and not across else "❌"
+    print(f" {status} typo index : {len(tests) - len(wrong)}/{len(tests)} typos resolved, "
+          f"{len(false_positives)} false positives in {len(patterns)} patterns "
+          f"({'with' if wordnet else 'without'} WordNet) {wrong or ''}{false_positives or ''}{across or ''}")
+
+    # A misspelled driver next to one the gazetteer found exactly
+    drivers = chatbot.extract_entity_values("Tell me about verstapen and hamilton", ("driver",))['driver']
+    status = "✅" if drivers == ["Max Verstappen", "Lewis Hamilton"] else "❌"
+    print(f" {status} typo index : exact and misspelled drivers in one message {drivers}")
+
+def test_micro_batcher():
+    """A cancelled future or a short batch result doesn't stop the batcher: later submits still resolve."""
+    import threading
+    from concurrent.futures import TimeoutError as FutureTimeout
+    from batching import MicroBatcher
+
+    release = threading.Event()
+
+    def double(items):
+        release.wait()
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_wait_ms=50)
+    cancelled = batcher.submit(1)
+    kept = batcher.submit(2)
+    cancelled_ok = cancelled.cancel()
+    release.set()
+    try:
+        after_cancel = kept.result(timeout=2) == 4 and batcher.submit(3).result(timeout=2) == 6
+    except FutureTimeout:
+        after_cancel = False
+    batcher.close()
+
+    short = MicroBatcher(lambda items: [0], max_wait_ms=50)
+    futures = [short.submit(i) for i in range(3)]
+    try:
+        errors = sum(isinstance(future.exception(timeout=2), ValueError) for future in futures)
+    except FutureTimeout:
+        errors = 0
+    short.batch_fn = lambda items: [item for item in items]
+    try:
+        recovered = short.submit(7).result(timeout=2) == 7
+    except FutureTimeout:
+        recovered = False
+    short.close()
+
+    status = "✅" if cancelled_ok and after_cancel and errors == 3 and recovered else "❌"
+    print(f" {status} micro-batcher : submit after a cancel {'resolves' if after_cancel else 'hangs'}, "
+          f"{errors}/3 futures of a short batch failed, next submit {'resolves' if recovered else 'hangs'}")
+
 if __name__ == "__main__":
     test()
+    test_clean_text()
+    test_micro_batcher()
+    test_numpy_parity()
+    test_round_index()
+    test_driver_registry()
+    test_typo_index()
+    test_single_flight()
+    test_deadline()
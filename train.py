@@ -1,100 +1,308 @@
 """
 Train the F1 chatbot model.
 Run this script when you modify intents.json.
+
+    python train.py                  # full training from random initialization
+    python train.py --incremental    # fine-tune model.pth on what changed in intents.json
 """
 
+import argparse
 import json
+import os
 import random
+import time
 import numpy as np
 import torch
 import torch.optim as optim
-from torch.utils.data import DataLoader, TensorDataset
-from utils import clean_text, Neural_Network
-
-with open("intents.json", "r", encoding="utf-8") as f:
-    intents = json.load(f)
-
-# prepare data for training 
-words = []
-classes = []
-documents = []
-
-for intent in intents['intents']:
-    for pattern in intent['patterns']:
-        wordlist = clean_text(pattern)
-        words.extend(wordlist)  # vocabulary
-        documents.append((wordlist, intent['tag']))
-        if intent['tag'] not in classes:
-            classes.append(intent['tag'])
-
-words = sorted(set(words))  # Remove duplicates and sort
-classes = sorted(set(classes))  # Sort classes
-
-training = []
-output = [0] * len(classes)
-
-for document in documents:
-    pattern_words = document[0]
-    bag = []
-    for word in words:
-        if word in pattern_words:
-            bag.append(1)
+from utils import clean_text, BagOfWords
+from network import Neural_Network
+from numpy_network import export_numpy
+from pattern_index import PatternIndex
+
+
+def load_intents(path="intents.json"):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def prepare_data(intents):
+    """
+    Returns:
+        (words, classes, documents) where documents is a list of (tokens, tag, pattern)
+    """
+    words = []
+    classes = []
+    documents = []
+
+    for intent in intents['intents']:
+        for pattern in intent['patterns']:
+            wordlist = clean_text(pattern)
+            words.extend(wordlist)  # vocabulary
+            documents.append((wordlist, intent['tag'], pattern))
+            if intent['tag'] not in classes:
+                classes.append(intent['tag'])
+
+    words = sorted(set(words))  # Remove duplicates and sort
+    classes = sorted(set(classes))  # Sort classes
+    return words, classes, documents
+
+
+def patterns_by_tag(intents):
+    """{tag: sorted patterns}, saved in model.pth so the next run can tell what changed"""
+    return {intent['tag']: sorted(intent['patterns']) for intent in intents['intents']}
+
+
+def diff_patterns(old, new):
+    """
+    Compares two patterns_by_tag() results.
+
+    Returns:
+        (changed tags, set of (tag, pattern) that are new or moved to another tag)
+    """
+    changed_tags = {tag for tag in old.keys() | new.keys() if old.get(tag) != new.get(tag)}
+    old_pairs = {(tag, pattern) for tag, patterns in old.items() for pattern in patterns}
+    new_pairs = {(tag, pattern) for tag, patterns in new.items() for pattern in patterns}
+    return changed_tags, new_pairs - old_pairs
+
+
+# Design matrices larger than this (patterns x vocabulary x 4 bytes) are kept
+# sparse: dense products are faster on small data, sparse ones on large data
+DENSE_LIMIT_BYTES = 16 * 2**20
+
+
+def to_tensors(documents, bag_of_words, class_index, sparse=None):
+    """
+    Returns (X, y): X is the bag-of-words design matrix, built in one step from
+    the token indices, and y holds the class indices. X is a sparse COO tensor
+    (memory grows with the number of tokens, not patterns x vocabulary) when
+    sparse=True, or by default when its dense form would exceed DENSE_LIMIT_BYTES.
+    """
+    rows, cols = bag_of_words.coordinates([document[0] for document in documents])
+    shape = (len(documents), len(bag_of_words))
+    if sparse is None:
+        sparse = shape[0] * shape[1] * 4 > DENSE_LIMIT_BYTES
+    if sparse:
+        X = torch.sparse_coo_tensor(torch.from_numpy(np.vstack([rows, cols])), torch.ones(len(rows)),
+                                    shape, check_invariants=True).coalesce()
+    else:
+        X = torch.zeros(shape)
+        X[torch.from_numpy(rows), torch.from_numpy(cols)] = 1.0
+    y = np.array([class_index[document[1]] for document in documents], dtype=np.int64)
+    return X, torch.from_numpy(y)
+
+
+def expand_model(data, words, classes):
+    """
+    Builds a Neural_Network for the new vocabulary and classes from a saved
+    model.pth: fc1 columns of known words, fc3 rows of known classes and the
+    whole fc2 are copied; new words and classes start from the usual random init.
+    """
+    model = Neural_Network(len(words), len(classes))
+    old_state = data['model_state']
+    state = model.state_dict()
+
+    old_word_index = {word: i for i, word in enumerate(data['words'])}
+    kept_words = [(i, old_word_index[word]) for i, word in enumerate(words) if word in old_word_index]
+    if kept_words:
+        new_columns, old_columns = map(list, zip(*kept_words))
+        state['fc1.weight'][:, new_columns] = old_state['fc1.weight'][:, old_columns]
+    state['fc1.bias'] = old_state['fc1.bias'].clone()
+    state['fc2.weight'] = old_state['fc2.weight'].clone()
+    state['fc2.bias'] = old_state['fc2.bias'].clone()
+
+    old_class_index = {tag: i for i, tag in enumerate(data['classes'])}
+    kept_classes = [(i, old_class_index[tag]) for i, tag in enumerate(classes) if tag in old_class_index]
+    if kept_classes:
+        new_rows, old_rows = map(list, zip(*kept_classes))
+        state['fc3.weight'][new_rows] = old_state['fc3.weight'][old_rows]
+        state['fc3.bias'][new_rows] = old_state['fc3.bias'][old_rows]
+
+    model.load_state_dict(state)
+    return model
+
+
+# How many times each new pattern appears in the fine-tuning set, so the few
+# new examples aren't drowned out by the ones the model already knows
+NEW_PATTERN_REPEATS = 5
+
+
+def split_validation(documents, fraction, new_patterns=()):
+    """
+    Holds out `fraction` of the known documents for early stopping.
+
+    Documents whose (tag, pattern) is in new_patterns are too few to hold out:
+    they are repeated NEW_PATTERN_REPEATS times in the training set and also
+    added to the validation set, so that the stopping point is where the model
+    has learned them without forgetting the held-out ones (on the held-out
+    documents alone, the untouched starting model would always look best).
+    """
+    new = [d for d in documents if (d[1], d[2]) in new_patterns]
+    known = [d for d in documents if (d[1], d[2]) not in new_patterns]
+    held_out = set(random.sample(range(len(known)), int(len(known) * fraction)))
+    training = new * NEW_PATTERN_REPEATS + [d for i, d in enumerate(known) if i not in held_out]
+    validation = [d for i, d in enumerate(known) if i in held_out]
+    if validation:
+        validation += new
+    return training, validation
+
+
+def batches(X, y, batch_size):
+    """Shuffled (dense batch_x, batch_y) minibatches of X (dense or sparse)"""
+    permutation = torch.randperm(len(y))
+    for start in range(0, len(y), batch_size):
+        index = permutation[start:start + batch_size]
+        batch_x = X.index_select(0, index)
+        yield (batch_x.to_dense() if batch_x.is_sparse else batch_x), y[index]
+
+
+def train_model(model, X, y, epochs=200, batch_size=8, lr=0.01, validation=None, patience=None,
+                full_batch=False):
+    """
+    Trains with SGD + momentum on minibatches of batch_size, or with
+    full_batch=True, with Adam on the whole matrix at once: one step
+    per epoch, whose matrix products use all of torch's threads.
+    With validation=(X_val, y_val) and patience, stops once the validation loss
+    hasn't improved for `patience` epochs and restores the best weights.
+    """
+    #Training setup
+    loss_fn = torch.nn.CrossEntropyLoss()
+    if full_batch:
+        optimizer = optim.Adam(model.parameters(), lr=lr)
+    else:
+        optimizer = optim.SGD(model.parameters(), lr=lr, momentum=0.9)
+
+    best_loss, best_state, stale_epochs = float("inf"), None, 0
+    for epoch in range(epochs):
+        model.train()
+        total_loss = 0
+        steps = [(X, y)] if full_batch else batches(X, y, batch_size)
+        for step, (batch_x, batch_y) in enumerate(steps, 1):
+            optimizer.zero_grad()
+            outputs = model(batch_x)
+            loss = loss_fn(outputs, batch_y)
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+
+        message = f"Epoch [{epoch+1}/{epochs}], Loss: {total_loss/step:.4f}"
+        if validation is not None and len(validation[1]):
+            model.eval()
+            with torch.no_grad():
+                validation_loss = loss_fn(model(validation[0]), validation[1]).item()
+            message += f", Validation loss: {validation_loss:.4f}"
+            if validation_loss < best_loss:
+                best_loss, stale_epochs = validation_loss, 0
+                best_state = {name: tensor.clone() for name, tensor in model.state_dict().items()}
+            else:
+                stale_epochs += 1
+
+        if (epoch + 1) % 20 == 0:
+            print(message)
+        if patience is not None and stale_epochs >= patience:
+            print(f"{message} (early stop)")
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    return model
+
+
+def save_model(model, words, classes, documents, patterns):
+    # Second-stage index for messages the model is unsure about (see pattern_index.py).
+    # Saved before the model files, which a running server.py watches
+    PatternIndex.build([(tokens, tag) for tokens, tag, _ in documents]).save("pattern_index.npz")
+    print("Pattern index saved as 'pattern_index.npz'")
+
+    #save model
+    data = {
+        "model_state": model.state_dict(),
+        "input_size": len(words),
+        "output_size": len(classes),
+        "words": words,
+        "classes": classes,
+        "patterns": patterns,
+    }
+
+    torch.save(data, "model.pth")
+    print("Model saved as 'model.pth'")
+
+    # torch-free copy for serving (see numpy_network.py)
+    state = {name: tensor.numpy() for name, tensor in model.state_dict().items()}
+    export_numpy(state, words, classes, "model.npz")
+    print("Inference weights saved as 'model.npz'")
+
+    # A server started with F1_MODEL_PATH=model_int8.npz watches that file
+    if os.path.exists("model_int8.npz"):
+        export_numpy(state, words, classes, "model_int8.npz", int8=True)
+        print("Int8 inference weights saved as 'model_int8.npz'")
+
+
+def main(incremental=False, epochs=None, validation_split=None, patience=None, full_batch=False,
+         threads=None, model_path="model.pth"):
+    if threads or full_batch:
+        torch.set_num_threads(threads or os.cpu_count() or 1)
+
+    intents = load_intents()
+    words, classes, documents = prepare_data(intents)
+    patterns = patterns_by_tag(intents)
+    bag_of_words = BagOfWords(words)
+    class_index = {tag: i for i, tag in enumerate(classes)}
+
+    new_pairs = set()
+    model = None
+    if incremental:
+        try:
+            data = torch.load(model_path, weights_only=True)
+        except FileNotFoundError:
+            data = None
+        if data is None or 'patterns' not in data:
+            print(f"No {model_path} with saved patterns to start from, training from scratch.")
         else:
-            bag.append(0)
-    row_output = list(output)    
-    row_output[classes.index(document[1])] = 1   
-    training.append((bag, row_output))        
-
-random.shuffle(training)
-training = np.array(training, dtype=object)
-X = np.array(list(training[:, 0]), dtype=np.float32)
-y = np.array([np.argmax(row) for row in training[:, 1]], dtype=np.int64)  
-
-#convert pytorch to tensors
-X_tensor = torch.from_numpy(X)
-y_tensor = torch.from_numpy(y)
-
-dataset = TensorDataset(X_tensor, y_tensor)
-loader = DataLoader(dataset, batch_size=8, shuffle=True)
-
-# Intialize model 
-input_size = len(words)
-output_size = len(classes)
-
-model = Neural_Network(input_size, output_size)
-
-#Training setup
-loss_fn = torch.nn.CrossEntropyLoss()  
-optimizer = optim.SGD(model.parameters(), lr=0.01, momentum=0.9)  
-
-#training
-
-print("Training started...")
-for epoch in range(200):
-    model.train()  
-    total_loss = 0
-    for batch_x, batch_y in loader:
-        optimizer.zero_grad()
-        outputs = model(batch_x)
-        loss = loss_fn(outputs, batch_y)
-        loss.backward()
-        optimizer.step()  
-        total_loss += loss.item()
-    
-    if (epoch + 1) % 20 == 0: 
-        print(f"Epoch [{epoch+1}/200], Loss: {total_loss/len(loader):.4f}")
-
-print("Training completed!")
-
-#save model
-data = {
-    "model_state": model.state_dict(),
-    "input_size": input_size,
-    "output_size": output_size,
-    "words": words,
-    "classes": classes
-}
-
-
-torch.save(data, "model.pth")
-print("Model saved as 'model.pth'")
+            changed_tags, new_pairs = diff_patterns(data['patterns'], patterns)
+            if not changed_tags:
+                print("intents.json has not changed since the last training run.")
+                return
+            print(f"Changed intents: {', '.join(sorted(changed_tags))} ({len(new_pairs)} new patterns)")
+            model = expand_model(data, words, classes)
+
+    if model is None:
+        # Intialize model
+        model = Neural_Network(len(words), len(classes))
+        defaults = {"epochs": 200, "validation_split": 0.0, "patience": None}
+    else:
+        # Fine-tuning: fewer epochs, stop as soon as the held-out loss stops improving
+        defaults = {"epochs": 60, "validation_split": 0.15, "patience": 10}
+    epochs = epochs or defaults["epochs"]
+    validation_split = defaults["validation_split"] if validation_split is None else validation_split
+    patience = defaults["patience"] if patience is None else patience
+
+    random.shuffle(documents)
+    training, held_out = split_validation(documents, validation_split, new_patterns=new_pairs)
+    X, y = to_tensors(training, bag_of_words, class_index)
+    validation = to_tensors(held_out, bag_of_words, class_index) if held_out else None
+
+    print("Training started...")
+    start = time.perf_counter()
+    train_model(model, X, y, epochs=epochs, validation=validation, patience=patience, full_batch=full_batch)
+    print(f"Training completed in {time.perf_counter() - start:.1f}s!")
+
+    save_model(model, words, classes, documents, patterns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the F1 chatbot intent model.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fine-tune the existing model.pth on the changes to intents.json")
+    parser.add_argument("--epochs", type=int, help="maximum epochs (default 200, or 60 with --incremental)")
+    parser.add_argument("--validation-split", type=float,
+                        help="fraction of patterns held out for early stopping (default 0, or 0.15 with --incremental)")
+    parser.add_argument("--patience", type=int,
+                        help="epochs without validation improvement before stopping (default 10 with --incremental)")
+    parser.add_argument("--full-batch", action="store_true",
+                        help="one Adam step per epoch over all patterns (fastest for large intents.json)")
+    parser.add_argument("--threads", type=int,
+                        help="torch threads (default: all cores with --full-batch, torch's default otherwise)")
+    args = parser.parse_args()
+
+    main(args.incremental, args.epochs, args.validation_split, args.patience, args.full_batch, args.threads)
@@ -0,0 +1,241 @@
+"""
+Typo-tolerant lookup over the gazetteer aliases (SymSpell).
+
+"verstapen", "leclrec" or "ferarri" miss the gazetteer, which only matches
+exact aliases, and spaCy rarely recovers them. Every alias is stored with
+all its variants of up to MAX_DISTANCE deleted characters; a word's own
+deletes then find every alias within that edit distance with a few dict
+lookups, whatever the number of aliases. Candidates are checked with the
+optimal string alignment distance (insertions, deletions, substitutions
+and adjacent transpositions).
+
+Short words are where typos turn into other words ("spa" / "say"), so
+aliases and words shorter than MIN_LENGTH are only matched exactly (by the
+gazetteer), and the allowed distance grows with the alias length. Longer
+English words can still be one edit away from an alias. Most of them change
+how the word starts or ends ("vetter" / "vettel", "oscars" / "oscar",
+"dustin" / "austin"), which slips of the keyboard rarely do, so words
+shorter than KEEP_ENDS_BELOW must keep the alias's first and last letter
+(or only swap the two letters at either end).
+The others ("hungry" / "hungary", "gorge" / "george") are English words,
+which are never corrected (WordNet, see is_english_word). Matches below
+MIN_CONFIDENCE are dropped.
+"""
+import re
+import threading
+from functools import lru_cache
+
+from nltk.corpus import wordnet
+
+from utils import F1_DRIVERS, F1_TEAMS, F1_RACES, ensure_nltk_data
+
+MAX_DISTANCE = 2
+MIN_LENGTH = 5
+# Words shorter than this only match aliases with the same first and last letter
+KEEP_ENDS_BELOW = 8
+# Lowest 1 - distance / alias length find() accepts; allowed_distance stays
+# within it (1 edit in 5 letters, 2 in 10), callers can ask for more
+MIN_CONFIDENCE = 0.8
+
+WORD = re.compile(r"[a-z]+")
+
+
+def allowed_distance(alias):
+    """1 edit for 5-9 letter aliases, 2 from 10 letters on"""
+    return 1 if len(alias) < 10 else MAX_DISTANCE
+
+
+def keeps_ends(word, alias):
+    """
+    True if word starts and ends like alias. Swapping the first or last two
+    letters ("onrris", "mclarne") keeps them: it is a slip, not another word.
+    """
+    starts = word[0] == alias[0] or (word[2:] == alias[2:] and word[:2] == alias[1] + alias[0])
+    ends = word[-1] == alias[-1] or (word[:-2] == alias[:-2] and word[-2:] == alias[-1] + alias[-2])
+    return starts and ends
+
+
+_wordnet_missing = False
+
+
+def is_english_word(word):
+    """
+    True if WordNet knows word or its base form ("cargos", "vetted"). Without
+    the WordNet data (see utils.ensure_nltk_data) no word counts as English.
+    """
+    global _wordnet_missing
+    if _wordnet_missing:
+        return False
+    ensure_nltk_data()
+    try:
+        return bool(wordnet.synsets(word))
+    except LookupError:
+        _wordnet_missing = True
+        print("WordNet is not available: English words near an alias may be corrected")
+        return False
+
+
+def deletes(word, distance):
+    """word and every string obtained by deleting up to `distance` characters from it"""
+    found = {word}
+
+    # Deleting positions in increasing order reaches every variant once
+    def delete_from(w, start, left):
+        for i in range(start, len(w)):
+            shorter = w[:i] + w[i + 1:]
+            found.add(shorter)
+            if left > 1:
+                delete_from(shorter, i, left - 1)
+
+    delete_from(word, 0, distance)
+    return found
+
+
+def osa_distance(a, b, limit):
+    """Optimal string alignment distance of a and b, or limit + 1 once it exceeds limit"""
+    # The common prefix and suffix don't change the distance, and for a
+    # one-letter typo they leave (almost) nothing to compare
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TypoIndex:
+    """
+    Maps misspelled aliases of dictionaries ({label: {alias: canonical name}})
+    to (label, canonical name, distance, confidence), where confidence is
+    1 - distance / alias length.
+    """
+
+    def __init__(self, dictionaries):
+        self.labels = list(dictionaries)
+        self.aliases = []     # (alias, label, canonical name)
+        self.candidates = {}  # delete -> alias indexes
+        for label, entries in dictionaries.items():
+            for alias, name in entries.items():
+                alias = alias.lower()
+                if len(alias) < MIN_LENGTH:
+                    continue
+                self.aliases.append((alias, label, name))
+                for variant in deletes(alias, allowed_distance(alias)):
+                    self.candidates.setdefault(variant, []).append(len(self.aliases) - 1)
+        self.exact = {alias for alias, _, _ in self.aliases}
+        self.max_words = max((alias.count(" ") + 1 for alias in self.exact), default=1)
+        # The same words ("driver", "standings", ...) come back in message after message
+        self._cached_lookup = lru_cache(maxsize=50000)(self._lookup)
+
+    def lookup(self, word, labels=None):
+        """
+        Closest alias of word (one of labels, default all) within its allowed distance:
+        (label, canonical name, distance, confidence), or None. Exact aliases are left
+        to the gazetteer and return None too.
+        """
+        return self._cached_lookup(word.lower(), None if labels is None else frozenset(labels))
+
+    def _lookup(self, word, labels):
+        if len(word) < MIN_LENGTH or word in self.exact:
+            return None
+        best = None
+        seen = set()
+        # Only aliases of 10+ letters allow 2 edits, and they are 2 letters away at most
+        for variant in deletes(word, MAX_DISTANCE if len(word) >= 8 else 1):
+            for i in self.candidates.get(variant, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                alias, label, name = self.aliases[i]
+                if labels is not None and label not in labels:
+                    continue
+                if len(word) < KEEP_ENDS_BELOW and not keeps_ends(word, alias):
+                    continue
+                limit = allowed_distance(alias)
+                distance = osa_distance(word, alias, limit)
+                if distance > limit:
+                    continue
+                match = (label, name, distance, 1 - distance / len(alias))
+                if best is None or (distance, -match[3]) < (best[2], -best[3]):
+                    best = match
+        # Only single words: a phrase ("aston martn") is rarely made of English words alone
+        if best is not None and " " not in word and is_english_word(word):
+            return None
+        return best
+
+    def find_all(self, text, labels=None, skip=(), min_confidence=MIN_CONFIDENCE):
+        """
+        Every misspelled mention in text, in reading order, as (label, canonical name,
+        start, end, confidence) with character offsets, leaving out matches below
+        min_confidence. Word pairs are tried before single words (for "max verstapen",
+        "aston martn") and a word belongs to one match at most; words inside the
+        (start, end) character spans in skip, found exactly already, are left out.
+        """
+        # Runs of consecutive words outside skip: a phrase never spans a skipped mention
+        runs = [[]]
+        for m in WORD.finditer(text.lower()):
+            if any(start < m.end() and m.start() < end for start, end in skip):
+                runs.append([])
+            else:
+                runs[-1].append((m.group(), m.start(), m.end()))
+        found = []
+        for words in runs:
+            used = set()  # indexes of the words in a match
+            for n in range(self.max_words, 0, -1):
+                for i in range(len(words) - n + 1):
+                    if used.intersection(range(i, i + n)):
+                        continue
+                    phrase = " ".join(word for word, _, _ in words[i:i + n])
+                    match = self.lookup(phrase, labels)
+                    if match is None:
+                        continue
+                    label, name, _, confidence = match
+                    if confidence < min_confidence:
+                        continue
+                    found.append((label, name, words[i][1], words[i + n - 1][2], confidence))
+                    used.update(range(i, i + n))
+        return sorted(found, key=lambda match: match[2])
+
+    def find(self, text, labels=None, skip=(), min_confidence=MIN_CONFIDENCE):
+        """Best misspelled mention per label in text (see find_all), as {label: (canonical name, confidence)}"""
+        found = {}
+        for label, name, _, _, confidence in self.find_all(text, labels, skip, min_confidence):
+            if label not in found or confidence > found[label][1]:
+                found[label] = (name, confidence)
+        return found
+
+
+# Built once on first use, over the same dictionaries as the gazetteer
+_typo_index = None
+_build_lock = threading.Lock()
+
+
+def get_typo_index():
+    global _typo_index
+    if _typo_index is None:
+        with _build_lock:
+            if _typo_index is None:
+                _typo_index = TypoIndex({
+                    "driver": F1_DRIVERS,
+                    "team": F1_TEAMS,
+                    "race": F1_RACES,
+                })
+    return _typo_index
@@ -1,22 +1,27 @@
 import re
+import unicodedata
+from functools import lru_cache
 import nltk
+import numpy as np
 from nltk.stem import WordNetLemmatizer
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+lemmatizer = WordNetLemmatizer()
 
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
+# NLTK data is probed (and downloaded if missing) on first use, not at import.
+# Only WordNet is needed: clean_text tokenizes without Punkt (see tokenize)
+_nltk_data_ready = False
 
+def ensure_nltk_data():
+    global _nltk_data_ready
+    if _nltk_data_ready:
+        return
 
-lemmatizer = WordNetLemmatizer()
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        nltk.download('wordnet')
+
+    _nltk_data_ready = True
 
 #  F1 driver dictionary
 F1_DRIVERS = {
@@ -132,28 +137,89 @@ F1_RACES = {
 
 
 
+def normalize_name(name):
+    """Lowercase ASCII words of a name, e.g. "Sergio Pérez" -> "sergio perez"."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"[a-z0-9]+", ascii_name.lower()))
+
+
+NON_LETTERS = re.compile(r'[^a-z\s]')
+
+# The only nltk.word_tokenize rules that can fire once text is reduced to [a-z\s]:
+# Treebank's apostrophe-free contractions. Punkt never splits such text into
+# sentences (there is no punctuation left), so tokenize() gives the same tokens.
+CONTRACTIONS = re.compile(r"\b(?:(can)(not)|(gim)(me)|(gon)(na)|(got)(ta)|(lem)(me)|(wan)(na))\b")
+
+def _split_contraction(match):
+    return " " + " ".join(part for part in match.groups() if part) + " "
+
+def tokenize(text):
+    """Same tokens as nltk.word_tokenize for text made only of a-z and whitespace"""
+    return CONTRACTIONS.sub(_split_contraction, text).split()
+
+# word -> lemma: a fixed table preloaded with the training vocabulary (preload_lemmas)
+# plus a bounded LRU cache for the words users send
+LEMMA_CACHE_SIZE = 50000
+_lemma_table = {}
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def _lemmatize_cached(word):
+    return lemmatizer.lemmatize(word)
+
+def lemmatize(word):
+    lemma = _lemma_table.get(word)
+    if lemma is None:
+        lemma = _lemmatize_cached(word)
+    return lemma
+
+def preload_lemmas(sentences):
+    """Lemmatizes every word of sentences (e.g. the intents.json patterns) into the fixed table"""
+    ensure_nltk_data()
+    for sentence in sentences:
+        for word in tokenize(NON_LETTERS.sub("", sentence.lower())):
+            if word not in _lemma_table:
+                _lemma_table[word] = lemmatizer.lemmatize(word)
+
 # clean text and lemmatize 
 def clean_text(sentence):
-    sentence = sentence.lower()
-    sentence = re.sub(r'[^a-z\s]', "", sentence)
-    words = nltk.word_tokenize(sentence)
-    words = [lemmatizer.lemmatize(word) for word in words]
-    return words
-
-# Neural network ( input , 2 hidden layers , output layer )
-class Neural_Network(nn.Module):
-    def __init__(self, input_size, output_size):
-        super(Neural_Network, self).__init__()
-        self.fc1 = nn.Linear(input_size, 128)
-        self.fc2 = nn.Linear(128, 64)
-        self.fc3 = nn.Linear(64, output_size)
-        self.relu = nn.ReLU()
-        self.dropout = nn.Dropout(0.5)
-
-    def forward(self, x):
-        x = F.relu(self.fc1(x))   
-        x = self.dropout(x)
-        x = F.relu(self.fc2(x))   
-        x = self.dropout(x)
-        x = self.fc3(x)
-        return x  
+    ensure_nltk_data()
+    sentence = NON_LETTERS.sub("", sentence.lower())
+    return [lemmatize(word) for word in tokenize(sentence)]
+
+# Bag-of-words featurizer : word -> column index is computed once from the vocabulary,
+# so a sentence only costs a dict lookup per token instead of a scan of the whole vocabulary
+class BagOfWords:
+    def __init__(self, words):
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def columns(self, tokens):
+        """Sorted column indices of the known tokens (unknown words are ignored)"""
+        return sorted({self.index[token] for token in tokens if token in self.index})
+
+    def coordinates(self, token_lists):
+        """
+        (row, column) indices of the ones in the bag-of-words matrix of a list
+        of tokenized sentences, as two int64 numpy arrays (sparse COO layout).
+        """
+        rows, cols = [], []
+        for row, tokens in enumerate(token_lists):
+            columns = self.columns(tokens)
+            rows.extend([row] * len(columns))
+            cols.extend(columns)
+        return np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+
+    def transform(self, token_lists):
+        """
+        Builds the 0/1 bag-of-words matrix for a list of tokenized sentences.
+        Only the columns of tokens present are written; the rest stays zero.
+
+        Returns:
+            float32 numpy array of shape (len(token_lists), vocabulary size)
+        """
+        bags = np.zeros((len(token_lists), len(self.words)), dtype=np.float32)
+        bags[self.coordinates(token_lists)] = 1.0
+        return bags